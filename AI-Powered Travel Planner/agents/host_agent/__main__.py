@@ -1,12 +1,27 @@
 from common.a2a_server import create_app
-from .task_manager import run
+from .task_manager import run, run_stream, run_batch, stats, warmup, background
 
 # Create agent wrapper class
 class AgentWrapper:
     async def execute(self, payload):
         return await run(payload)
 
-app = create_app(agent=AgentWrapper())
+    def stream(self, payload):
+        return run_stream(payload)
+
+    def execute_batch(self, payloads, concurrency, ordered):
+        return run_batch(payloads, concurrency, ordered)
+
+    def stats(self):
+        return stats()
+
+    async def warmup(self):
+        await warmup()
+
+    async def background(self):
+        await background()
+
+app = create_app(agent=AgentWrapper(), name="host_agent")
 
 if __name__ == "__main__":
     import uvicorn
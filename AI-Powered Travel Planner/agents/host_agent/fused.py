@@ -0,0 +1,87 @@
+from dotenv import load_dotenv
+from common.metrics import JSON_PARSE_FAILURES
+from common.models import create_model
+from common.specialist import Specialist
+from shared.schemas import TravelPlan
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Result keys of the combined answer, matching the specialist agents
+RESULT_KEYS = ("flights", "stays", "activities")
+
+
+# Define the fused planner: one model call returning all three sections
+def build_agent():
+    """Build the ADK agent (imports google.adk, so it runs on first use)"""
+    from google.adk.agents import Agent
+    from google.genai import types
+
+    return Agent(
+        name="planner_agent",
+        model=create_model("gemini-2.5-flash", agent="planner"),
+        # Sampling settings and the output token cap (raised if answers get cut off)
+        generate_content_config=types.GenerateContentConfig(
+            temperature=0.3,
+            max_output_tokens=1500
+        ),
+        description="Plans flights, stays and activities for a trip in one answer.",
+        # Sent verbatim as the system instruction ahead of the prompt, so the
+        # shared prefix is identical on every call and eligible for prompt caching
+        static_instruction=(
+            "Given an origin, destination, dates, and budget, suggest 2-3 flight options, "
+            "2-3 hotel options and 2-3 tourist activities that together fit the budget. "
+            "Be concise."
+        ),
+        # Constrains the model to JSON in exactly this shape
+        output_schema=TravelPlan
+    )
+
+
+class FusedPlanner(Specialist):
+    """Specialist whose answer holds every section; split per result key"""
+
+    def _parse(self, response_text):
+        if response_text is None:
+            return {key: "No response from model." for key in RESULT_KEYS}
+        parsed = self._load(response_text)
+        if not isinstance(parsed, dict):
+            parsed = {}
+
+        # Sections the model got right are kept; the others fall back to the raw text
+        result = {}
+        for key in RESULT_KEYS:
+            value = parsed.get(key)
+            result[key] = value if isinstance(value, list) else response_text
+        if not self._cacheable(result):
+            JSON_PARSE_FAILURES.inc(agent=self.agent.name)
+        return result
+
+    @property
+    def item_keys(self):
+        return RESULT_KEYS
+
+    def _cacheable(self, result):
+        return all(isinstance(result[key], list) for key in RESULT_KEYS)
+
+
+# Session management, request coalescing and response caching
+planner = FusedPlanner("planner", build_agent, "plan")
+
+def build_prompt(request):
+    """Build the combined planning prompt from a travel request"""
+    origin = request.get('origin', 'your location')
+    return (
+        f"User is travelling from {origin} to {request['destination']} from {request['start_date']} to "
+        f"{request['end_date']}, with a total trip budget of ${request['budget']}. Suggest 2-3 flights, "
+        f"2-3 hotels and 2-3 activities. Respond in JSON format using the keys 'flights', 'stays' and "
+        f"'activities', each with a list."
+    )
+
+async def execute(request):
+    """Plan flights, stays and activities with a single model call"""
+    return await planner.execute(build_prompt(request))
+
+def stream(request):
+    """Stream flights, stays and activities from a single model call as they are generated"""
+    return planner.stream(build_prompt(request))
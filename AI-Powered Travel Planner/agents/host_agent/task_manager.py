@@ -1,84 +1,582 @@
-from common.a2a_client import call_agent
+from common.a2a_client import (
+    agent_ready, agent_url, call_agent, call_agent_batch, call_agent_stream, register_local_agent, warmup_agent
+)
+from common import rate_limit
+from common.batch import BATCH_CONCURRENCY, iter_batch
+from common.metrics import PLAN_COST, PLAN_LATENCY, PLAN_TOKENS
+from common.plan_cache import TTLCache
+from common.singleflight import SingleFlight
+from common.usage import TOKEN_FIELDS, USAGE_KEY, USAGE_PATH, get_usage_ledger, summarize
+from shared.schemas import TravelRequest
+from pydantic import ValidationError
 import asyncio
+import contextlib
+import os
+import sqlite3
+import time
+from . import fused
+from .warmer import CacheWarmer
 
-FLIGHT_URL = "http://localhost:8001/run"
-STAY_URL = "http://localhost:8002/run"
-ACTIVITIES_URL = "http://localhost:8003/run"
+# http://host:port/run over TCP, or http+unix://<encoded socket path>/run
+FLIGHT_URL = os.getenv("FLIGHT_AGENT_URL", agent_url("flight_agent", 8001))
+STAY_URL = os.getenv("STAY_AGENT_URL", agent_url("stay_agent", 8002))
+ACTIVITIES_URL = os.getenv("ACTIVITIES_AGENT_URL", agent_url("activities_agent", 8003))
 
-async def run(payload):
+# Used instead of HTTP when A2A_TRANSPORT=inprocess
+register_local_agent(FLIGHT_URL, "agents.flight_agent.task_manager")
+register_local_agent(STAY_URL, "agents.stay_agent.task_manager")
+register_local_agent(ACTIVITIES_URL, "agents.activities_agent.task_manager")
+
+# (response section, agent label, agent URL, result key, fallback message)
+AGENTS = [
+    ("flights", "Flight", FLIGHT_URL, "flights", "No flights returned."),
+    ("stay", "Stay", STAY_URL, "stays", "No stay options returned."),
+    ("activities", "Activities", ACTIVITIES_URL, "activities", "No activities found."),
+]
+
+# "fanout" calls the three specialist agents in parallel; "fused" asks one
+# planner model call for all sections (fewer requests, one shared instruction)
+PLAN_MODE = os.getenv("PLAN_MODE", "fanout").lower()
+
+# Plan cache in front of the fan-out (set PLAN_CACHE_MAX_ENTRIES=0 to disable)
+PLAN_CACHE_BUDGET_BUCKET = float(os.getenv("PLAN_CACHE_BUDGET_BUCKET", "250"))
+plan_cache = TTLCache(
+    max_entries=int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "1024")),
+    ttl=float(os.getenv("PLAN_CACHE_TTL", "900")),
+    stale_ttl=float(os.getenv("PLAN_CACHE_STALE_TTL", "300")),
+)
+
+# Background stale-while-revalidate refreshes, keyed by cache key
+_refreshing = {}
+
+# Concurrent identical requests share one call per specialist
+inflight = SingleFlight()
+
+# Daily token and cost rollups (AGENT_USAGE_PATH), opened by _usage_ledger()
+usage_ledger = None
+
+
+async def _call_section(section, payload, key=None, emit=None):
     """
-    Orchestrate calls to all specialized agents in parallel.
+    Call one specialist agent and return its section with the raw result.
+    With emit, the agent's options are streamed and an item event for each
+    one (or a reset event, see _reset_event) is passed to emit(event) as
+    soon as the agent produces it.
+    """
+    url = section[2]
+    if emit is None:
+        call = lambda: call_agent(url, payload)
+    else:
+        call = lambda: _stream_section(section, payload, emit)
+    try:
+        if key is None:
+            result = await call()
+        else:
+            # Only the first of several identical requests sees the options early
+            result = await inflight.do((url, key), call)
+    except Exception as e:
+        result = e
+    return section, result
+
+
+async def _stream_section(section, payload, emit):
+    """Relay one specialist's streamed options to emit and return its final result"""
+    result = None
+    async for event in call_agent_stream(section[2], payload):
+        if "item" in event:
+            emit(_item_event(section, event["item"]))
+        elif event.get("reset"):
+            emit(_reset_event(section))
+        elif event.get("done"):
+            result = event.get("result")
+    return result
+
+
+def _section_event(section, result):
+    """
+    Turn a specialist agent result into a streamed section event.
 
     Args:
-        payload: Travel request with destination, dates, and budget
+        section: Entry from AGENTS describing the specialist
+        result: The agent's JSON response, or the exception it raised
 
     Returns:
-        Combined results from all agents
+        Dict with the section name, its data and an optional error message
+    """
+    name, label, _, key, fallback = section
+
+    print("-" * 50)
+    print(f"{label} Agent Response:", result)
+    print("-" * 50)
+
+    event = {"section": name}
+    if isinstance(result, Exception):
+        error_msg = f"{label} agent error: {str(result)}"
+        print(f"❌ {error_msg}")
+        event["error"] = error_msg
+        result = {}
+    elif not isinstance(result, dict):
+        result = {}
+
+    event["data"] = result.get(key, fallback)
+    return event
+
+
+def _usage_event(result):
+    """
+    Take the token usage out of a specialist result.
+
+    Popping it means a result shared by coalesced requests is charged to
+    only one of them.
+
+    Returns:
+        {"usage": record} for the host to aggregate (never sent to clients), or None
+    """
+    if isinstance(result, dict) and isinstance(result.get(USAGE_KEY), dict):
+        return {"usage": result.pop(USAGE_KEY)}
+    return None
+
+
+async def _usage_ledger():
+    """The daily usage rollup, opened off the event loop on first use"""
+    global usage_ledger
+    if usage_ledger is None and USAGE_PATH:
+        usage_ledger = await asyncio.to_thread(get_usage_ledger)
+    return usage_ledger
+
+
+async def _account(usage):
+    """Record a plan's summarized token usage and cost in metrics and the daily rollup"""
+    for agent, record in usage["agents"].items():
+        for field in TOKEN_FIELDS:
+            PLAN_TOKENS.inc(record[field], agent=agent, type=field.removesuffix("_tokens"))
+        PLAN_COST.inc(record["cost_usd"], agent=agent)
+    if not usage["total"]["calls"]:
+        return
+    ledger = await _usage_ledger()
+    if ledger is not None:
+        try:
+            await ledger.add(usage)
+        except sqlite3.Error as e:
+            print(f"⚠️  Could not update the usage rollup: {e}")
+
+
+def _cache_key(payload):
+    """Normalized plan cache key, or None if the payload is not a valid TravelRequest"""
+    try:
+        return TravelRequest(**payload).cache_key(PLAN_CACHE_BUDGET_BUCKET)
+    except (ValidationError, TypeError):
+        return None
+
+
+def _cacheable(sections):
+    """Only plans whose every section parsed into a list of options are worth caching"""
+    return all(isinstance(data, list) for data in sections.values())
+
+
+def _validation_error(payload):
+    """Why a payload is not a valid TravelRequest, or None if it is"""
+    try:
+        TravelRequest(**payload)
+    except TypeError:
+        return "invalid travel request: expected a JSON object"
+    except ValidationError as e:
+        fields = "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
+        return f"invalid travel request: {fields}"
+    return None
+
+
+def _item_event(section, item):
+    """Streamed event for one option, ahead of its section's final event"""
+    return {"section": section[0], "item": item}
+
+
+def _reset_event(section):
+    """Streamed event voiding a section's options so far: its answer was cut off and rerun"""
+    return {"section": section[0], "reset": True}
+
+
+async def _fan_out(payload, key=None, items=False):
+    """
+    Call all specialized agents in parallel, yielding section events as they
+    finish and, with items=True, an item event for each option as soon as
+    its agent has generated it.
+    """
+    events = asyncio.Queue()
+    emit = events.put_nowait if items else None
+
+    async def call(section):
+        section, result = await _call_section(section, payload, key, emit)
+        usage = _usage_event(result)
+        if usage is not None:
+            events.put_nowait(usage)
+        events.put_nowait(_section_event(section, result))
+
+    tasks = [asyncio.ensure_future(call(section)) for section in AGENTS]
+    async for event in _drain(events, tasks):
+        yield event
+
+
+async def _drain(events, tasks):
+    """Yield queued events until every section's final event is out, then stop the tasks"""
+    try:
+        remaining = len(AGENTS)
+        while remaining:
+            event = await events.get()
+            if "data" in event:
+                remaining -= 1
+            yield event
+    finally:
+        # Client went away mid-stream: don't leave agent calls running
+        for task in tasks:
+            task.cancel()
+
+
+async def _fused(payload, key=None, items=False):
+    """
+    Plan every section with one fused model call, yielding section events
+    (preceded, with items=True, by an item event per option as it is generated)
+    """
+    events = asyncio.Queue()
+    sections = {section[3]: section for section in AGENTS}
+
+    async def stream():
+        result = None
+        async for event in fused.stream(payload):
+            if "item" in event:
+                events.put_nowait(_item_event(sections[event["key"]], event["item"]))
+            elif event.get("reset"):
+                for section in AGENTS:
+                    events.put_nowait(_reset_event(section))
+            elif event.get("done"):
+                result = event["result"]
+        return result
+
+    call = stream if items else (lambda: fused.execute(payload))
+
+    async def plan():
+        try:
+            if key is None:
+                result = await call()
+            else:
+                result = await inflight.do(("fused", key), call)
+        except Exception as e:
+            # One planner call failed: report it once, not as three agent errors
+            error_msg = f"Planner agent error: {str(e)}"
+            print(f"❌ {error_msg}")
+            (name, _, _, _, fallback), *others = AGENTS
+            events.put_nowait({"section": name, "data": fallback, "error": error_msg})
+            for name, _, _, _, fallback in others:
+                events.put_nowait({"section": name, "data": fallback})
+            return
+        usage = _usage_event(result)
+        if usage is not None:
+            events.put_nowait(usage)
+        for section in AGENTS:
+            events.put_nowait(_section_event(section, result))
+
+    async for event in _drain(events, [asyncio.ensure_future(plan())]):
+        yield event
+
+
+def _plan(payload, key=None, items=False):
+    """Section (and, with items=True, item) events for a plan, built in the configured PLAN_MODE"""
+    if PLAN_MODE == "fused":
+        return _fused(payload, key, items)
+    return _fan_out(payload, key, items)
+
+
+async def _refresh(key, payload):
+    """
+    Recompute a plan in the background, at background rate-limiter priority,
+    and store it if every agent succeeded with a parsed answer.
+
+    Returns:
+        Usage summary of the model calls made
+    """
+    usages = []
+    try:
+        # Coalesced apart from live requests, which must not wait on a call
+        # queued at background priority
+        with rate_limit.priority("background"):
+            sections = {}
+            async with contextlib.aclosing(_plan(payload, ("refresh", key))) as events:
+                async for event in events:
+                    if "usage" in event:
+                        usages.append(event["usage"])
+                    elif "error" in event:
+                        break
+                    else:
+                        sections[event["section"]] = event["data"]
+                else:
+                    if _cacheable(sections):
+                        plan_cache.set(key, sections)
+    except Exception as e:
+        print(f"❌ Background plan refresh failed: {e}")
+    finally:
+        _refreshing.pop(key, None)
+    usage = summarize(usages)
+    await _account(usage)
+    return usage
+
+
+def _start_refresh(key, payload):
+    """Refresh a plan in the background, joining a refresh of the same plan already running"""
+    if key not in _refreshing:
+        _refreshing[key] = asyncio.ensure_future(_refresh(key, dict(payload)))
+    return _refreshing[key]
+
+
+# Keeps the most requested plans cached ahead of expiry (PLAN_WARMER_*)
+warmer = CacheWarmer(plan_cache, _start_refresh, _cache_key)
+
+
+async def run_stream(payload, items=True):
+    """
+    Call all specialized agents in parallel (or the fused planner, with
+    PLAN_MODE=fused) and yield each section as soon as its agent finishes. Plans for equivalent requests are served from the
+    plan cache; stale entries are returned immediately and refreshed in the
+    background.
+
+    Args:
+        payload: Travel request with destination, dates, and budget
+        items: Also stream each option ({"section", "item"}) as soon as the
+            model has generated it, ahead of its section's event. A
+            {"section", "reset": True} event voids the section's options
+            streamed so far, when its answer was cut off and rerun
+
+    Yields:
+        One event per agent ({"section", "data", optional "error"}), followed
+        by a final {"done": True, "errors": [...], "cached": bool, "usage": ...}
+        event, where usage holds the tokens and cost of the request in total
+        and per agent
     """
     # Print what the host agent is receiving
     print("=" * 50)
     print("Host Agent: Incoming payload:", payload)
     print("=" * 50)
 
+    start = time.monotonic()
+    key = _cache_key(payload)
+    warmer.record(key, payload)
+    if key is not None:
+        cached, state = plan_cache.get(key)
+        if cached is not None:
+            print(f"⚡ Plan cache hit ({state})")
+            if state == "stale":
+                _start_refresh(key, payload)
+            for name, data in cached.items():
+                yield {"section": name, "data": data}
+            PLAN_LATENCY.observe(time.monotonic() - start, mode=PLAN_MODE, cached="true")
+            yield {"done": True, "errors": [], "cached": True, "usage": summarize([])}
+            return
+
+    sections = {}
+    errors = []
+    usages = []
+    async for event in _plan(payload, key, items):
+        if "usage" in event:
+            usages.append(event["usage"])
+            continue
+        if "error" in event:
+            errors.append(event["error"])
+        if "data" in event:
+            sections[event["section"]] = event["data"]
+        yield event
+
+    if errors:
+        print(f"\n⚠️  {len(errors)} agent(s) failed")
+    elif key is not None and _cacheable(sections):
+        plan_cache.set(key, sections)
+    PLAN_LATENCY.observe(time.monotonic() - start, mode=PLAN_MODE, cached="false")
+    usage = summarize(usages)
+    await _account(usage)
+    yield {"done": True, "errors": errors, "cached": False, "usage": usage}
+
+
+def _plan_response(sections, errors, usage=None):
+    """Combine section data into the /run response shape"""
+    # Keep the section order stable regardless of completion order
+    response = {name: sections[name] for name, *_ in AGENTS}
+
+    # Add error information if any agents failed
+    if errors:
+        response["errors"] = errors
+
+    # Tokens and cost spent on this plan
+    if usage is not None:
+        response["usage"] = usage
+
+    return response
+
+
+async def run_batch(payloads, concurrency=BATCH_CONCURRENCY, ordered=True):
+    """
+    Plan many trips at once. Cached plans are answered directly; the rest are
+    sent to each specialist as a single batch and reassembled per trip.
+
+    Args:
+        payloads: List of travel requests
+        concurrency: Maximum number of items each specialist runs at once
+        ordered: Yield plans in input order (True) or as they complete (False)
+
+    Yields:
+        {"index": i, "result": plan} per trip, where plan has the /run shape,
+        or {"index": i, "error": "..."} for a payload that is not a valid
+        travel request
+    """
+    print("=" * 50)
+    print(f"Host Agent: Incoming batch of {len(payloads)} payload(s)")
+    print("=" * 50)
+
+    if PLAN_MODE == "fused":
+        async def plan(payload):
+            error = _validation_error(payload)
+            if error is not None:
+                raise ValueError(error)
+            return await run(payload)
+
+        # No specialist batches to build: plan each trip with its own fused call
+        async for item in iter_batch(plan, payloads, concurrency, ordered):
+            yield item
+        return
+
+    finished = {}  # index -> item ready to be yielded
+    keys = [_cache_key(payload) for payload in payloads]
+    misses = []
+    for index, key in enumerate(keys):
+        if key is None:
+            # Not worth a model call: the specialists would reject it too
+            finished[index] = {"index": index, "error": _validation_error(payloads[index])}
+            continue
+        cached = plan_cache.get(key)[0]
+        if cached is not None:
+            finished[index] = {"index": index, "result": _plan_response(cached, [], summarize([]))}
+        else:
+            misses.append(index)
+
+    queue = asyncio.Queue()
+
+    async def pump(section):
+        """Forward one specialist's batch results to the queue, filling gaps with errors"""
+        delivered = set()
+        try:
+            async for item in call_agent_batch(section[2], [payloads[i] for i in misses], concurrency, ordered=False):
+                index = misses[item["index"]]
+                delivered.add(index)
+                result = RuntimeError(item["error"]) if "error" in item else item.get("result")
+                usage = _usage_event(result)
+                event = _section_event(section, result)
+                if usage is not None:
+                    event.update(usage)
+                queue.put_nowait((index, event))
+        except Exception as e:
+            failure = e
+        else:
+            failure = RuntimeError("no result returned")
+        for index in misses:
+            if index not in delivered:
+                queue.put_nowait((index, _section_event(section, failure)))
+
+    pumps = [asyncio.ensure_future(pump(section)) for section in AGENTS] if misses else []
+    partial = {index: {} for index in misses}
+    next_index = 0
     try:
-        # Call all agents in parallel for better performance
-        results = await asyncio.gather(
-            call_agent(FLIGHT_URL, payload),
-            call_agent(STAY_URL, payload),
-            call_agent(ACTIVITIES_URL, payload),
-            return_exceptions=True
-        )
-
-        flights, stay, activities = results
-
-        # Log outputs
-        print("\n" + "-" * 50)
-        print("Flight Agent Response:", flights)
-        print("-" * 50)
-        print("Stay Agent Response:", stay)
-        print("-" * 50)
-        print("Activities Agent Response:", activities)
-        print("-" * 50 + "\n")
-
-        # Check for errors and provide detailed feedback
-        errors = []
+        if not ordered:
+            for index in sorted(finished):
+                yield finished.pop(index)
 
-        if isinstance(flights, Exception):
-            error_msg = f"Flight agent error: {str(flights)}"
-            print(f"❌ {error_msg}")
-            errors.append(error_msg)
-            flights = {}
-        elif not isinstance(flights, dict):
-            flights = {}
+        remaining = len(misses)
+        while True:
+            if ordered:
+                while next_index in finished:
+                    yield finished.pop(next_index)
+                    next_index += 1
+            if remaining == 0:
+                break
 
-        if isinstance(stay, Exception):
-            error_msg = f"Stay agent error: {str(stay)}"
-            print(f"❌ {error_msg}")
-            errors.append(error_msg)
-            stay = {}
-        elif not isinstance(stay, dict):
-            stay = {}
+            index, event = await queue.get()
+            partial[index][event["section"]] = event
+            if len(partial[index]) < len(AGENTS):
+                continue
+
+            # All specialists answered for this trip
+            remaining -= 1
+            events = partial.pop(index).values()
+            sections = {event["section"]: event["data"] for event in events}
+            errors = [event["error"] for event in events if "error" in event]
+            if not errors and _cacheable(sections):
+                plan_cache.set(keys[index], sections)
+            usage = summarize([event["usage"] for event in events if "usage" in event])
+            await _account(usage)
+            item = {"index": index, "result": _plan_response(sections, errors, usage)}
+            if ordered:
+                finished[index] = item
+            else:
+                yield item
+    finally:
+        for task in pumps:
+            task.cancel()
+
+
+async def warmup():
+    """Open the usage rollup and connections to (or warm up in-process) specialist agents"""
+    await _usage_ledger()
+    if PLAN_MODE == "fused":
+        await fused.planner.warmup()
+        return
+    await asyncio.gather(*(warmup_agent(url) for _, _, url, _, _ in AGENTS))
 
-        if isinstance(activities, Exception):
-            error_msg = f"Activities agent error: {str(activities)}"
-            print(f"❌ {error_msg}")
-            errors.append(error_msg)
-            activities = {}
-        elif not isinstance(activities, dict):
-            activities = {}
-
-        response = {
-            "flights": flights.get("flights", "No flights returned."),
-            "stay": stay.get("stays", "No stay options returned."),
-            "activities": activities.get("activities", "No activities found.")
-        }
 
-        # Add error information if any agents failed
-        if errors:
-            response["errors"] = errors
-            print(f"\n⚠️  {len(errors)} agent(s) failed")
+async def background():
+    """Run the plan cache warmer for the lifetime of the server, once the specialists are ready"""
+    if not warmer.enabled:
+        return
+    if PLAN_MODE != "fused":
+        while not all(await asyncio.gather(*(agent_ready(url) for _, _, url, _, _ in AGENTS))):
+            await asyncio.sleep(1)
+    await warmer.run()
+
+
+def stats():
+    """Plan cache, request coalescing, cache warmer and today's token usage counters for the /health endpoint"""
+    counters = {
+        "plan_mode": PLAN_MODE,
+        "plan_cache": plan_cache.stats(),
+        "coalesced": inflight.coalesced,
+        "in_flight": len(inflight),
+    }
+    if warmer.enabled:
+        counters["warmer"] = warmer.stats()
+    if usage_ledger is not None:
+        counters["usage_today"] = usage_ledger.today()
+    if PLAN_MODE == "fused":
+        counters["planner"] = fused.planner.stats()
+    return counters
+
+
+async def run(payload):
+    """
+    Orchestrate calls to all specialized agents in parallel.
+
+    Args:
+        payload: Travel request with destination, dates, and budget
+
+    Returns:
+        Combined results from all agents
+    """
+    try:
+        sections = {}
+        errors = []
+        usage = None
+        async for event in run_stream(payload, items=False):
+            if event.get("done"):
+                errors = event["errors"]
+                usage = event["usage"]
+            else:
+                sections[event["section"]] = event["data"]
 
-        return response
+        return _plan_response(sections, errors, usage)
 
     except Exception as e:
         error_msg = f"Error in host agent orchestration: {e}"
@@ -0,0 +1,215 @@
+import asyncio
+import json
+import os
+import time
+from collections import Counter, deque
+from datetime import date
+
+from common.config import DATA_DIR
+
+# Background plan cache warmer: how many popular plans to keep warm (0, the
+# default, disables it; every warmed plan costs real model calls)
+TOP_N = int(os.getenv("PLAN_WARMER_TOP_N", "0"))
+INTERVAL = float(os.getenv("PLAN_WARMER_INTERVAL", "60"))
+# Refresh a popular plan this many seconds before its cache entry expires
+LEAD = float(os.getenv("PLAN_WARMER_LEAD", "120"))
+# Tokens the warmer may spend per rolling hour
+TOKEN_BUDGET = int(os.getenv("PLAN_WARMER_TOKEN_BUDGET", "100000"))
+# Requests older than this no longer count towards popularity
+HISTORY_WINDOW = float(os.getenv("PLAN_WARMER_HISTORY_WINDOW", "86400"))
+# A plan must have been requested at least this often to be warmed
+MIN_REQUESTS = int(os.getenv("PLAN_WARMER_MIN_REQUESTS", "2"))
+# Request history kept across restarts, so a fresh deploy warms what was popular
+HISTORY_PATH = os.getenv("PLAN_WARMER_HISTORY_PATH", os.path.join(DATA_DIR, "plan_history.json"))
+MAX_HISTORY = 10000
+
+
+class CacheWarmer:
+    """
+    Keeps the most requested plans in the plan cache.
+
+    Every request is recorded with its plan cache key. Every ``interval``
+    seconds the ``top_n`` keys requested at least ``min_requests`` times
+    within ``history_window`` are checked, and any that are missing or due
+    to expire within ``lead`` seconds are recomputed ahead of time, one at a
+    time. Trips that have already started are skipped. Tokens spent are
+    capped at ``token_budget`` per rolling hour.
+    """
+
+    def __init__(self, cache, refresh, key_fn, top_n=TOP_N, interval=INTERVAL, lead=LEAD,
+                 token_budget=TOKEN_BUDGET, history_window=HISTORY_WINDOW, min_requests=MIN_REQUESTS,
+                 history_path=HISTORY_PATH):
+        """
+        Args:
+            cache: The plan TTLCache
+            refresh: Async function (key, payload) recomputing and caching a
+                plan, returning its usage summary (see common/usage.py)
+            key_fn: Function mapping a payload to its plan cache key, or None
+        """
+        self.cache = cache
+        self.refresh = refresh
+        self.key_fn = key_fn
+        self.top_n = top_n
+        self.interval = interval
+        self.lead = lead
+        self.token_budget = token_budget
+        self.history_window = history_window
+        self.min_requests = min_requests
+        self.history_path = history_path
+
+        self._history = deque()  # (wall time, key, payload), oldest first
+        self._counts = Counter()
+        self._payloads = {}  # key -> latest payload
+        self._spent = deque()  # (wall time, tokens) per warmed plan
+
+        self.warmed = 0
+        self.skipped_budget = 0
+        self.failures = 0
+
+    @property
+    def enabled(self):
+        return self.top_n > 0
+
+    def record(self, key, payload):
+        """Count a plan request towards its key's popularity"""
+        if not self.enabled or key is None:
+            return
+        self._add(time.time(), key, dict(payload))
+
+    def _add(self, at, key, payload):
+        self._history.append((at, key, payload))
+        self._counts[key] += 1
+        self._payloads[key] = payload
+        self._expire(at)
+        while len(self._history) > MAX_HISTORY:
+            self._drop_oldest()
+
+    def _expire(self, now):
+        while self._history and self._history[0][0] < now - self.history_window:
+            self._drop_oldest()
+
+    def _drop_oldest(self):
+        _, key, _ = self._history.popleft()
+        self._counts[key] -= 1
+        if self._counts[key] <= 0:
+            del self._counts[key]
+            del self._payloads[key]
+
+    def popular(self):
+        """Up to top_n (key, payload) pairs for upcoming trips, most requested first"""
+        self._expire(time.time())
+        today = date.today().isoformat()
+        popular = []
+        for key, count in self._counts.most_common():
+            if count < self.min_requests or len(popular) >= self.top_n:
+                break
+            payload = self._payloads[key]
+            if str(payload.get("start_date", "")) >= today:
+                popular.append((key, payload))
+        return popular
+
+    def _tokens_spent(self):
+        """Tokens spent on warming within the last hour"""
+        now = time.time()
+        while self._spent and self._spent[0][0] < now - 3600:
+            self._spent.popleft()
+        return sum(tokens for _, tokens in self._spent)
+
+    def _due(self, key):
+        """True if the plan is not cached or expires within the lead time"""
+        age = self.cache.age(key)
+        return age is None or age >= self.cache.ttl - self.lead
+
+    async def warm_once(self):
+        """
+        Refresh the popular plans that are missing or about to expire.
+
+        Returns:
+            Number of plans recomputed
+        """
+        warmed = 0
+        for key, payload in self.popular():
+            if not self._due(key):
+                continue
+            if self._tokens_spent() >= self.token_budget:
+                self.skipped_budget += 1
+                print("🪫 Cache warmer token budget spent for this hour")
+                break
+            try:
+                usage = await self.refresh(key, dict(payload))
+            except Exception as e:
+                self.failures += 1
+                print(f"❌ Cache warmer could not plan {key}: {e}")
+                continue
+            self._spent.append((time.time(), usage["total"]["total_tokens"] if usage else 0))
+            warmed += 1
+        self.warmed += warmed
+        if warmed:
+            print(f"🌡️  Cache warmer refreshed {warmed} popular plan(s)")
+        return warmed
+
+    async def run(self):
+        """
+        Warm the cache now (with the history a previous process saved) and
+        then every interval seconds until cancelled, saving the history as
+        it goes.
+        """
+        if not self.enabled:
+            return
+        self.load()
+        try:
+            while True:
+                try:
+                    await self.warm_once()
+                except Exception as e:
+                    print(f"❌ Cache warmer cycle failed: {e}")
+                await asyncio.to_thread(self.save, self._entries())
+                await asyncio.sleep(self.interval)
+        finally:
+            self.save(self._entries())
+
+    def load(self):
+        """Restore the request history saved by a previous process"""
+        if not self.history_path or not os.path.exists(self.history_path):
+            return
+        try:
+            with open(self.history_path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Could not load the plan request history: {e}")
+            return
+        cutoff = time.time() - self.history_window
+        for at, payload in entries:
+            key = self.key_fn(payload)
+            if at >= cutoff and key is not None:
+                self._add(at, key, payload)
+
+    def _entries(self):
+        """Request history as saved to disk: [wall time, payload] pairs"""
+        return [[at, payload] for at, _, payload in self._history]
+
+    def save(self, entries):
+        """Write the request history, replacing the previous file atomically"""
+        if not self.history_path:
+            return
+        directory = os.path.dirname(self.history_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        partial = f"{self.history_path}.tmp"
+        try:
+            with open(partial, "w") as f:
+                json.dump(entries, f)
+            os.replace(partial, self.history_path)
+        except OSError as e:
+            print(f"⚠️  Could not save the plan request history: {e}")
+
+    def stats(self):
+        """Warmer counters for the /health endpoint"""
+        return {
+            "tracked_plans": len(self._counts),
+            "warmed": self.warmed,
+            "tokens_last_hour": self._tokens_spent(),
+            "token_budget": self.token_budget,
+            "skipped_budget": self.skipped_budget,
+            "failures": self.failures,
+        }
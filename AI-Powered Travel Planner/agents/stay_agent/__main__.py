@@ -1,14 +1,29 @@
+from common.a2a_client import agent_socket_path
 from common.a2a_server import create_app
-from .task_manager import run
+from .task_manager import run, run_stream, stats, warmup
 
 # Create agent wrapper class
 class AgentWrapper:
     async def execute(self, payload):
         return await run(payload)
 
-app = create_app(agent=AgentWrapper())
+    def stream(self, payload):
+        return run_stream(payload)
+
+    def stats(self):
+        return stats()
+
+    async def warmup(self):
+        await warmup()
+
+app = create_app(agent=AgentWrapper(), name="stay_agent")
 
 if __name__ == "__main__":
     import uvicorn
-    print("Starting Stay Agent on port 8002...")
-    uvicorn.run(app, host="0.0.0.0", port=8002)
+    uds = agent_socket_path("stay_agent")
+    if uds:
+        print(f"Starting Stay Agent on {uds}...")
+        uvicorn.run(app, uds=uds)
+    else:
+        print("Starting Stay Agent on port 8002...")
+        uvicorn.run(app, host="0.0.0.0", port=8002)
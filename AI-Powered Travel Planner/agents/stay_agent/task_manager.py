@@ -1,5 +1,17 @@
-from .agent import execute
+from .agent import execute, specialist, stream
 
 async def run(payload):
     """Run the stay agent with the given payload"""
     return await execute(payload)
+
+def run_stream(payload):
+    """Stream the stay agent's options for the given payload"""
+    return stream(payload)
+
+async def warmup():
+    """Pre-build the runner, session service and model client"""
+    await specialist.warmup()
+
+def stats():
+    """Request coalescing and cache counters for the /health endpoint"""
+    return specialist.stats()
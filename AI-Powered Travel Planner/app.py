@@ -4,23 +4,70 @@ import re
 import os
 from urllib.parse import quote
 import asyncio
-from google.adk.agents import Agent
-from google.adk.models import Gemini
-from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
-from google.genai import types
+import time
+from pydantic import BaseModel
 
 # --- Get API Key from Streamlit Secrets or Environment ---
 try:
     GOOGLE_API_KEY = st.secrets.get("GOOGLE_API_KEY") or os.getenv("GOOGLE_API_KEY")
 except:
     GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+# The Gemini client reads the key from the environment
+if GOOGLE_API_KEY:
+    os.environ["GOOGLE_API_KEY"] = GOOGLE_API_KEY
+
+# "fanout" asks three agents in parallel; "fused" asks one agent for all sections
+try:
+    PLAN_MODE = (st.secrets.get("PLAN_MODE") or os.getenv("PLAN_MODE", "fanout")).lower()
+except:
+    PLAN_MODE = os.getenv("PLAN_MODE", "fanout").lower()
+
+# Gemini model the agents run on
+try:
+    GEMINI_MODEL = st.secrets.get("GEMINI_MODEL") or os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
+except:
+    GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
 
 # --- Constants for icons ---
 FLIGHT_ICON_URL = "https://i.ibb.co/9g0d8x1/flight-icon.png"
 HOTEL_ICON_URL = "https://i.ibb.co/jLwzS3s/hotel-icon.png"
 ACTIVITY_ICON_URL = "https://i.ibb.co/dKqgBbr/activity-icon.png"
 
+# --- Response Schemas (the model is constrained to answer in these shapes) ---
+class FlightOption(BaseModel):
+    airline: str
+    departure_time: str
+    arrival_time: str
+    duration: str
+    price: float
+
+class StayOption(BaseModel):
+    name: str
+    location: str
+    rating: float
+    price_per_night: float
+    amenities: list[str]
+
+class ActivityOption(BaseModel):
+    name: str
+    description: str
+    price: float
+    duration_hours: float
+
+class FlightOptions(BaseModel):
+    flights: list[FlightOption]
+
+class StayOptions(BaseModel):
+    stays: list[StayOption]
+
+class ActivityOptions(BaseModel):
+    activities: list[ActivityOption]
+
+class TravelPlan(BaseModel):
+    flights: list[FlightOption]
+    stays: list[StayOption]
+    activities: list[ActivityOption]
+
 # --- Helper Functions ---
 def extract_json_from_markdown(text):
     if isinstance(text, (list, dict)):
@@ -39,48 +86,100 @@ def extract_json_from_markdown(text):
 @st.cache_resource
 def get_agents():
     """Initialize all AI agents (cached for performance)"""
-    
+    # Imported here so the page renders before the ADK/GenAI stack loads
+    from google.adk.agents import Agent
+    from google.genai import types
+
+    # Sampling settings and the output token cap, sent with every call
+    config = types.GenerateContentConfig(temperature=0.3, max_output_tokens=500)
+
     # Flight Agent
     flight_agent = Agent(
         name="flight_agent",
-        model=Gemini(model="gemini-2.0-flash-exp", api_key=GOOGLE_API_KEY, temperature=0.3, max_output_tokens=500),
+        model=GEMINI_MODEL,
+        generate_content_config=config,
         description="Flight recommender",
-        instruction=(
-            "Suggest 2-3 flight options in JSON format. Be concise. "
-            "Format: {\"flights\": [{\"airline\": \"...\", \"departure_time\": \"...\", "
-            "\"arrival_time\": \"...\", \"duration\": \"...\", \"price\": ...}]}"
-        )
+        static_instruction="Suggest 2-3 flight options. Be concise.",
+        output_schema=FlightOptions
     )
     
     # Stay Agent
     stay_agent = Agent(
         name="stay_agent",
-        model=Gemini(model="gemini-2.0-flash-exp", api_key=GOOGLE_API_KEY, temperature=0.3, max_output_tokens=500),
+        model=GEMINI_MODEL,
+        generate_content_config=config,
         description="Hotel recommender",
-        instruction=(
-            "Suggest 2-3 hotel options in JSON format. Be concise. "
-            "Format: {\"stays\": [{\"name\": \"...\", \"location\": \"...\", \"rating\": ..., "
-            "\"price_per_night\": ..., \"amenities\": [...]}]}"
-        )
+        static_instruction="Suggest 2-3 hotel options. Be concise.",
+        output_schema=StayOptions
     )
     
     # Activities Agent
     activities_agent = Agent(
         name="activities_agent",
-        model=Gemini(model="gemini-2.0-flash-exp", api_key=GOOGLE_API_KEY, temperature=0.3, max_output_tokens=500),
+        model=GEMINI_MODEL,
+        generate_content_config=config,
         description="Activities recommender",
-        instruction=(
-            "Suggest 2-3 tourist activities in JSON format. Be concise. "
-            "Format: {\"activities\": [{\"name\": \"...\", \"description\": \"...\", "
-            "\"price\": ..., \"duration_hours\": ...}]}"
-        )
+        static_instruction="Suggest 2-3 tourist activities. Be concise.",
+        output_schema=ActivityOptions
     )
     
     return flight_agent, stay_agent, activities_agent
 
-async def get_recommendations(origin, destination, start_date, end_date, budget):
+@st.cache_resource
+def get_planner_agent():
+    """Initialize the fused planner agent used when PLAN_MODE is "fused" (cached)"""
+    from google.adk.agents import Agent
+    from google.genai import types
+
+    return Agent(
+        name="planner_agent",
+        model=GEMINI_MODEL,
+        generate_content_config=types.GenerateContentConfig(temperature=0.3, max_output_tokens=1500),
+        description="Trip planner",
+        static_instruction="Suggest 2-3 flight options, 2-3 hotel options and 2-3 tourist activities. Be concise.",
+        output_schema=TravelPlan
+    )
+
+async def run_agent(runner, prompt, session_id, usage=None):
+    """Run one agent to its final response, adding reported tokens to usage["tokens"] and usage["cached"]"""
+    from google.genai import types
+
+    await runner.session_service.create_session(app_name=runner.app_name, user_id="user", session_id=session_id)
+    message = types.Content(role="user", parts=[types.Part(text=prompt)])
+    text = "{}"
+    async for event in runner.run_async(user_id="user", session_id=session_id, new_message=message):
+        if usage is not None and event.usage_metadata and event.usage_metadata.total_token_count:
+            usage["tokens"] = usage.get("tokens", 0) + event.usage_metadata.total_token_count
+            usage["cached"] = usage.get("cached", 0) + (event.usage_metadata.cached_content_token_count or 0)
+        if event.is_final_response():
+            text = event.content.parts[0].text
+    return text
+
+async def get_fused_recommendations(origin, destination, start_date, end_date, budget, usage=None):
+    """Get all three sections from a single planner agent call"""
+    from google.adk.runners import Runner
+    from google.adk.sessions import InMemorySessionService
+
+    runner = Runner(agent=get_planner_agent(), app_name="planner_app", session_service=InMemorySessionService())
+    prompt = (
+        f"Trip from {origin} to {destination}, {start_date} to {end_date}, budget ${budget}. "
+        f"Flights, hotels and activities."
+    )
+    plan = extract_json_from_markdown(await run_agent(runner, prompt, "planner_session", usage))
+    if not isinstance(plan, dict):
+        return [plan, plan, plan]
+
+    # Same shape as the three separate agent answers
+    return [{key: plan.get(key, [])} for key in ("flights", "stays", "activities")]
+
+async def get_recommendations(origin, destination, start_date, end_date, budget, usage=None):
     """Get travel recommendations from all AI agents"""
-    
+    if PLAN_MODE == "fused":
+        return await get_fused_recommendations(origin, destination, start_date, end_date, budget, usage)
+
+    from google.adk.runners import Runner
+    from google.adk.sessions import InMemorySessionService
+
     flight_agent, stay_agent, activities_agent = get_agents()
     
     # Create runners and sessions
@@ -93,19 +192,11 @@ async def get_recommendations(origin, destination, start_date, end_date, budget)
     stay_prompt = f"Hotels in {destination}, {start_date} to {end_date}, budget ${budget}"
     activities_prompt = f"Activities in {destination}, {start_date} to {end_date}, budget ${budget}"
     
-    # Run agents in parallel
-    async def run_agent(runner, prompt, session_id):
-        message = types.Content(role="user", parts=[types.Part(text=prompt)])
-        async for event in runner.run_async(user_id="user", session_id=session_id, new_message=message):
-            if event.is_final_response():
-                return event.content.parts[0].text
-        return "{}"
-    
     # Execute all agents in parallel
     results = await asyncio.gather(
-        run_agent(flight_runner, flight_prompt, "flight_session"),
-        run_agent(stay_runner, stay_prompt, "stay_session"),
-        run_agent(activities_runner, activities_prompt, "activities_session"),
+        run_agent(flight_runner, flight_prompt, "flight_session", usage),
+        run_agent(stay_runner, stay_prompt, "stay_session", usage),
+        run_agent(activities_runner, activities_prompt, "activities_session", usage),
         return_exceptions=True
     )
     
@@ -487,11 +578,14 @@ if submit_button:
         with st.spinner("🔮 Planning your perfect trip with AI..."):
             try:
                 # Get recommendations from AI agents
+                usage = {}
+                started = time.perf_counter()
                 results = asyncio.run(get_recommendations(
                     origin, destination, 
                     str(start_date), str(end_date), 
-                    budget
+                    budget, usage
                 ))
+                elapsed = time.perf_counter() - started
                 
                 # Parse results
                 flights_text, stays_text, activities_text = results
@@ -506,6 +600,8 @@ if submit_button:
                 activities = activities_data.get("activities", []) if isinstance(activities_data, dict) else []
                 
                 st.success("✅ Your travel plan is ready!")
+                st.caption(f"Planned in {elapsed:.1f}s using {usage.get('tokens', 0):,} tokens, "
+                           f"{usage.get('cached', 0):,} from the prompt cache ({PLAN_MODE} mode)")
                 
                 # Display results
                 st.markdown('<div class="results-grid">', unsafe_allow_html=True)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Import-time budget check for the agent processes and the Streamlit app.
+
+Imports each entry point in a fresh interpreter under ``python -X importtime``,
+sums the cumulative time of the top-level imports and fails if a module goes
+over its budget or eagerly imports a heavy package that should be deferred
+until first use (google.adk / google.genai are loaded by the startup warm-up
+or the first request, not at import).
+
+Usage:
+    python check_import_time.py [--repeat N] [--scale X]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+# (module, budget in ms, packages that must not be imported eagerly)
+TARGETS = [
+    ("agents.host_agent.__main__", 1000, ("google.adk", "google.genai", "streamlit")),
+    ("agents.flight_agent.__main__", 1000, ("google.adk", "google.genai")),
+    ("agents.stay_agent.__main__", 1000, ("google.adk", "google.genai")),
+    ("agents.activities_agent.__main__", 1000, ("google.adk", "google.genai")),
+    ("app", 1000, ("google.adk", "google.genai")),
+]
+
+
+def measure(module):
+    """
+    Import a module in a fresh interpreter.
+
+    Returns:
+        (total import time in ms, set of imported module names)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr[-2000:]}")
+
+    total_us = 0
+    imported = set()
+    for line in result.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        imported.add(name.strip())
+        # Only top-level imports count; nested ones are included in their parent
+        if not name.startswith("  "):
+            total_us += int(cumulative)
+    return total_us / 1000, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if agent startup imports regress past their budget")
+    parser.add_argument("--repeat", type=int, default=3, help="imports per module; the fastest one counts")
+    parser.add_argument("--scale", type=float, default=float(os.getenv("IMPORT_BUDGET_SCALE", "1")),
+                        help="multiply every budget, e.g. 2 on slow CI machines")
+    args = parser.parse_args()
+
+    failures = []
+    for module, budget_ms, deferred in TARGETS:
+        runs = [measure(module) for _ in range(max(1, args.repeat))]
+        elapsed_ms = min(ms for ms, _ in runs)
+        imported = runs[0][1]
+        budget_ms *= args.scale
+
+        eager = sorted(name for name in imported for package in deferred
+                       if name == package or name.startswith(package + "."))
+        ok = elapsed_ms <= budget_ms and not eager
+        print(f"{'✅' if ok else '❌'} {module}: {elapsed_ms:.0f} ms (budget {budget_ms:.0f} ms)")
+        if elapsed_ms > budget_ms:
+            failures.append(f"{module} took {elapsed_ms:.0f} ms, budget is {budget_ms:.0f} ms")
+        if eager:
+            failures.append(f"{module} eagerly imports {', '.join(eager[:5])}")
+
+    if failures:
+        print("\nImport-time budget exceeded:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("\nAll imports within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,158 @@
+import importlib
+import json
+import os
+import time
+from urllib.parse import quote, unquote, urlsplit
 import httpx
+from common import rate_limit, tracing
+from common.batch import iter_batch, BATCH_CONCURRENCY
+from common.metrics import DOWNSTREAM_LATENCY
+
+# Connection pool settings (override via environment variables)
+MAX_CONNECTIONS = int(os.getenv("A2A_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("A2A_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("A2A_KEEPALIVE_EXPIRY", "30"))
+HTTP2 = os.getenv("A2A_HTTP2", "false").lower() in ("1", "true", "yes")
+TIMEOUT = 60.0
+
+# Transport used by call_agent: "http" (default) posts to the agent's URL,
+# "inprocess" calls the agent's task_manager.run() directly in this event loop
+TRANSPORT = os.getenv("A2A_TRANSPORT", "http").lower()
+
+# Agent URL -> task_manager module path, for the in-process transport
+_local_agents = {}
+
+# Directory holding specialist agents' Unix domain sockets; when set, agents
+# bind "<dir>/<name>.sock" instead of a TCP port and the host reaches them there
+UDS_DIR = os.getenv("AGENT_UDS_DIR")
+UDS_SCHEME = "http+unix"
+
+# Process-wide pooled client, opened/closed by the FastAPI lifespan
+_client = None
+# Pooled clients for Unix domain socket agents, keyed by socket path
+_uds_clients = {}
+
+
+def _http2_available():
+    """HTTP/2 needs the optional 'h2' package (pip install httpx[http2])"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def agent_socket_path(name):
+    """Unix socket an agent should bind (creating AGENT_UDS_DIR), or None to use its TCP port"""
+    if not UDS_DIR:
+        return None
+    os.makedirs(UDS_DIR, exist_ok=True)
+    return os.path.join(UDS_DIR, f"{name}.sock")
+
+
+def agent_url(name, port):
+    """
+    Default /run URL for an agent.
+
+    Returns:
+        "http+unix://<percent-encoded socket path>/run" when AGENT_UDS_DIR is
+        set, otherwise "http://localhost:<port>/run"
+    """
+    path = agent_socket_path(name)
+    if path is None:
+        return f"http://localhost:{port}/run"
+    return f"{UDS_SCHEME}://{quote(path, safe='')}/run"
+
+
+def _headers():
+    """Trace context and request priority for a call to another agent"""
+    return rate_limit.inject(tracing.inject())
+
+
+def _limits():
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+def start_client():
+    """
+    Open the shared pooled HTTP client if it is not already open.
+
+    Returns:
+        The shared httpx.AsyncClient
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        http2 = HTTP2
+        if http2 and not _http2_available():
+            print("⚠️  A2A_HTTP2 is set but 'h2' is not installed, falling back to HTTP/1.1")
+            http2 = False
+        _client = httpx.AsyncClient(limits=_limits(), timeout=TIMEOUT, http2=http2)
+    return _client
+
+
+async def close_client():
+    """Close the shared pooled HTTP clients and release their connections"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    while _uds_clients:
+        _, client = _uds_clients.popitem()
+        await client.aclose()
+
+
+def get_client():
+    """Return the shared pooled client, opening it lazily outside a lifespan"""
+    return start_client()
+
+
+def _resolve(url):
+    """
+    Pick the pooled client for an agent URL.
+
+    Returns:
+        Tuple of (client, request URL). For http+unix:// URLs the client is
+        bound to the socket and the request URL is rewritten to plain http.
+    """
+    parts = urlsplit(url)
+    if parts.scheme != UDS_SCHEME:
+        return get_client(), url
+
+    socket_path = unquote(parts.netloc)
+    client = _uds_clients.get(socket_path)
+    if client is None or client.is_closed:
+        transport = httpx.AsyncHTTPTransport(uds=socket_path, limits=_limits())
+        client = httpx.AsyncClient(transport=transport, timeout=TIMEOUT)
+        _uds_clients[socket_path] = client
+    request_url = f"http://localhost{parts.path}" + (f"?{parts.query}" if parts.query else "")
+    return client, request_url
+
+
+def register_local_agent(url, module):
+    """
+    Register the in-process implementation of an agent endpoint.
+
+    Args:
+        url: The agent endpoint URL used with call_agent
+        module: Dotted path of a module exposing an async run(payload),
+            e.g. "agents.flight_agent.task_manager" (imported on first call)
+    """
+    _local_agents[url] = module
+
+
+def _local_handler(url, name="run"):
+    """The in-process agent's task_manager function, or None to use HTTP"""
+    if TRANSPORT != "inprocess":
+        return None
+    module = _local_agents.get(url)
+    if module is None:
+        return None
+    return getattr(importlib.import_module(module), name, None)
+
 
 async def call_agent(url: str, payload: dict):
     """
@@ -11,7 +165,144 @@ async def call_agent(url: str, payload: dict):
     Returns:
         The JSON response from the agent
     """
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, json=payload, timeout=60.0)
-        response.raise_for_status()
-        return response.json()
+    start = time.monotonic()
+    status = "error"
+    try:
+        with tracing.span(f"call_agent {url}"):
+            handler = _local_handler(url)
+            if handler is not None:
+                result = await handler(payload)
+            else:
+                client, request_url = _resolve(url)
+                response = await client.post(request_url, json=payload, headers=_headers(), timeout=TIMEOUT)
+                response.raise_for_status()
+                result = response.json()
+                if isinstance(result, dict) and tracing.TIMING_KEY in result:
+                    # Fold the agent's own breakdown into ours
+                    result = dict(result)
+                    tracing.add_timings(result.pop(tracing.TIMING_KEY))
+        status = "ok"
+        return result
+    finally:
+        DOWNSTREAM_LATENCY.observe(time.monotonic() - start, target=url, status=status)
+
+
+async def call_agent_stream(url: str, payload: dict):
+    """
+    Call an agent's /run_stream endpoint and relay its events as they arrive.
+
+    Args:
+        url: The agent's /run endpoint URL (the stream URL is derived from it)
+        payload: The request payload
+
+    Yields:
+        The agent's NDJSON events, e.g. {"key": ..., "item": ...} per option
+        followed by {"done": True, "result": ...}
+    """
+    start = time.monotonic()
+    status = "error"
+    try:
+        with tracing.span(f"call_agent_stream {url}"):
+            handler = _local_handler(url, "run_stream")
+            if handler is not None:
+                async for event in handler(payload):
+                    yield event
+            else:
+                stream_url = url[:-len("/run")] + "/run_stream" if url.endswith("/run") else url.rstrip("/") + "/run_stream"
+                client, stream_url = _resolve(stream_url)
+                async with client.stream("POST", stream_url, json=payload, headers=_headers(), timeout=TIMEOUT) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line:
+                            continue
+                        event = json.loads(line)
+                        if event.get("done") and tracing.TIMING_KEY in event:
+                            # Fold the agent's own breakdown into ours
+                            tracing.add_timings(event.pop(tracing.TIMING_KEY))
+                        yield event
+        status = "ok"
+    finally:
+        DOWNSTREAM_LATENCY.observe(time.monotonic() - start, target=url, status=status)
+
+
+async def call_agent_batch(url: str, payloads: list, concurrency: int = BATCH_CONCURRENCY, ordered: bool = True):
+    """
+    Send a batch of payloads to an agent's /run_batch endpoint.
+
+    Args:
+        url: The agent's /run endpoint URL (the batch URL is derived from it)
+        payloads: List of request payloads
+        concurrency: Maximum number of items the agent runs at once
+        ordered: Ask for results in input order instead of completion order
+
+    Yields:
+        {"index": i, "result": ...} or {"index": i, "error": "..."} per item
+    """
+    start = time.monotonic()
+    status = "error"
+    try:
+        with tracing.span(f"call_agent_batch {url}"):
+            handler = _local_handler(url)
+            if handler is not None:
+                async for item in iter_batch(handler, payloads, concurrency, ordered):
+                    yield item
+            else:
+                batch_url = url[:-len("/run")] + "/run_batch" if url.endswith("/run") else url.rstrip("/") + "/run_batch"
+                body = {"items": payloads, "concurrency": concurrency, "ordered": ordered}
+                client, batch_url = _resolve(batch_url)
+                # Per-item results stream back, so only bound the wait between lines
+                async with client.stream("POST", batch_url, json=body, headers=_headers(), timeout=TIMEOUT) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if line:
+                            yield json.loads(line)
+        status = "ok"
+    finally:
+        DOWNSTREAM_LATENCY.observe(time.monotonic() - start, target=url, status=status)
+
+
+async def warmup_agent(url: str):
+    """
+    Prepare a downstream agent before the first real request: in-process
+    agents are imported and warmed up, HTTP agents get a pooled connection
+    opened by a /health request.
+
+    Args:
+        url: The agent's /run endpoint URL
+    """
+    if TRANSPORT == "inprocess" and url in _local_agents:
+        module = importlib.import_module(_local_agents[url])
+        if hasattr(module, "warmup"):
+            await module.warmup()
+        return
+
+    client, health_url = _resolve(_health_url(url))
+    try:
+        await client.get(health_url, timeout=5.0)
+    except httpx.HTTPError:
+        # The agent may still be starting; the first real call will connect
+        pass
+
+
+async def agent_ready(url: str):
+    """
+    Check whether a downstream agent can serve requests.
+
+    Args:
+        url: The agent's /run endpoint URL
+
+    Returns:
+        True if its /health endpoint answers 200 (always, for in-process agents)
+    """
+    if TRANSPORT == "inprocess" and url in _local_agents:
+        return True
+    client, health_url = _resolve(_health_url(url))
+    try:
+        response = await client.get(health_url, timeout=5.0)
+    except httpx.HTTPError:
+        return False
+    return response.status_code == 200
+
+
+def _health_url(url):
+    return url[:-len("/run")] + "/health" if url.endswith("/run") else url.rstrip("/") + "/health"
@@ -1,26 +1,311 @@
-from fastapi import FastAPI
-import uvicorn
+from contextlib import asynccontextmanager, contextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+import asyncio
+import json
+import time
+from common import rate_limit, tracing
+from common.a2a_client import start_client, close_client
+from common.admission import AdmissionController, Overloaded
+from common.batch import iter_batch, BATCH_CONCURRENCY
+from common.metrics import REGISTRY, REQUEST_LATENCY, REQUESTS_IN_FLIGHT, ADMISSION_WAIT, record_stats
 
-def create_app(agent):
+
+def _lifespan(agent):
+    """
+    Build the app lifespan: open the shared A2A HTTP client, warm the agent up
+    in the background (/health reports not-ready until it finishes), run the
+    agent's background task once it is ready, and stop both and close the
+    client on shutdown.
+    """
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        start_client()
+        app.state.ready = not hasattr(agent, "warmup")
+        tasks = []
+        if not app.state.ready:
+            tasks.append(asyncio.ensure_future(_warm_up(app, agent)))
+        if hasattr(agent, "background"):
+            tasks.append(asyncio.ensure_future(_background(app, agent)))
+        try:
+            yield
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await close_client()
+
+    return lifespan
+
+
+async def _warm_up(app, agent):
+    try:
+        await agent.warmup()
+    except Exception as e:
+        # Serve anyway: a cold agent is better than one that never becomes ready
+        print(f"⚠️  Warm-up failed: {e}")
+    finally:
+        app.state.ready = True
+
+
+async def _background(app, agent):
+    # Background work competes with requests; start it once warm-up is done
+    while not app.state.ready:
+        await asyncio.sleep(0.1)
+    await agent.background()
+
+
+def _overloaded(error):
+    """Fast rejection telling the client when to retry"""
+    return JSONResponse(
+        status_code=503,
+        content={"error": f"Agent overloaded: {error}", "retry_after": error.retry_after},
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
+
+def _bad_request(message):
+    """Rejection of a malformed request body"""
+    return JSONResponse(status_code=400, content={"error": message})
+
+
+def _batch_params(batch):
+    """
+    Validate a /run_batch body.
+
+    Returns:
+        (items, concurrency, ordered), with concurrency capped at
+        A2A_BATCH_CONCURRENCY
+
+    Raises:
+        ValueError: With a message for the client if the body is malformed
+    """
+    items = batch.get("items")
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        raise ValueError("'items' must be a list of JSON objects")
+    concurrency = batch.get("concurrency", BATCH_CONCURRENCY)
+    if isinstance(concurrency, bool) or not isinstance(concurrency, int) or concurrency < 1:
+        raise ValueError("'concurrency' must be a positive integer")
+    return items, min(concurrency, BATCH_CONCURRENCY), bool(batch.get("ordered", True))
+
+
+class _RequestScope:
+    """Admission slot, trace span, priority and metrics for one request to a /run endpoint"""
+
+    def __init__(self, admission, agent_name, endpoint, request, priority="interactive", slots=1):
+        self.admission = admission
+        # Admission slots held: one per model call the request runs at once
+        self.slots = slots
+        self.agent_name = agent_name
+        self.endpoint = endpoint
+        self.span = tracing.new_span(f"{agent_name} /{endpoint}", tracing.extract(request.headers))
+        # Caller asked for a timing breakdown in the response
+        self.timings = [] if request.headers.get(tracing.TIMING_HEADER) == "1" else None
+        # Rate limiter queue priority, passed on by the calling agent
+        self.priority = request.headers.get(rate_limit.PRIORITY_HEADER, priority)
+        self._start = time.monotonic()
+        self._admitted_at = None
+        self._finished = False
+
+    async def admit(self):
+        """
+        Take an admission slot.
+
+        Raises:
+            Overloaded: If the request was rejected
+        """
+        try:
+            self._admitted_at = await self.admission.acquire(self.slots)
+        except Overloaded:
+            REQUEST_LATENCY.observe(time.monotonic() - self._start, agent=self.agent_name,
+                                    endpoint=self.endpoint, status="rejected")
+            raise
+        ADMISSION_WAIT.observe(self._admitted_at - self._start, agent=self.agent_name)
+        REQUESTS_IN_FLIGHT.inc(agent=self.agent_name)
+
+    @contextmanager
+    def activate(self):
+        """Make this request's span, timing breakdown and priority current"""
+        with tracing.activate(self.span, self.timings), rate_limit.priority(self.priority):
+            yield
+
+    def with_timings(self, result):
+        """Attach the timing breakdown to a dict result if the caller asked for it"""
+        if self.timings is None or not isinstance(result, dict):
+            return result
+        breakdown = self.timings + [{"span": self.span.name, "ms": self.span.elapsed_ms()}]
+        return {**result, tracing.TIMING_KEY: breakdown}
+
+    def finish(self, status):
+        """Free the slot, end the span and record the request; later calls do nothing"""
+        if self._finished:
+            return
+        self._finished = True
+        self.admission.release(self._admitted_at, self.slots)
+        REQUESTS_IN_FLIGHT.dec(agent=self.agent_name)
+        REQUEST_LATENCY.observe(time.monotonic() - self._start, agent=self.agent_name,
+                                endpoint=self.endpoint, status=status)
+        self.span.attributes["status"] = status
+        tracing.end_span(self.span)
+
+
+class _NDJSONResponse(StreamingResponse):
+    """
+    NDJSON stream holding a request scope until the response is over.
+
+    The scope is finished once the response is over, even if the body
+    generator never started (e.g. the client disconnected first) and so
+    never reached its own finally.
+    """
+
+    def __init__(self, content, request_scope):
+        super().__init__(content, media_type="application/x-ndjson")
+        self.request_scope = request_scope
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.request_scope.finish("error")
+
+
+def _ndjson(events, scope):
+    """Stream events as NDJSON, holding the admission slot until the stream ends"""
+    async def lines():
+        status = "error"
+        try:
+            with scope.activate():
+                async for event in events:
+                    if isinstance(event, dict) and event.get("done"):
+                        event = scope.with_timings(event)
+                    yield json.dumps(event) + "\n"
+                status = "ok"
+        finally:
+            scope.finish(status)
+
+    return _NDJSONResponse(lines(), scope)
+
+
+def create_app(agent, name="agent"):
     """
     Create a FastAPI app with a standard /run endpoint for A2A protocol.
 
     Args:
-        agent: An agent object with an execute() method
+        agent: An agent object with an execute() method, and optionally a
+            stream() async generator exposed as NDJSON on /run_stream and a
+            stats() method whose counters are reported by /health. An
+            execute_batch(payloads, concurrency, ordered) async generator, if
+            present, replaces the per-item default behind /run_batch. An
+            async warmup() method, if present, runs at startup and /health
+            answers 503 until it completes. An async background() method,
+            if present, runs for the lifetime of the app from the moment
+            warm-up completes
+        name: Agent name used as the "agent" label on /metrics
+
+    Requests to the /run endpoints pass through an admission controller:
+    beyond the configured concurrency and wait queue they are rejected with
+    503 and a Retry-After header. A batch takes one slot per item it runs
+    at once. /metrics reports latency histograms,
+    in-flight gauges and agent counters in Prometheus text format.
+
+    Each request joins the caller's trace (traceparent header). Callers that
+    send "X-Trace-Timing: 1" get a "_timing" breakdown in the response (or in
+    the final "done" event of /run_stream). Model calls queue for the rate
+    limiter at the priority in the X-Request-Priority header, by default
+    "interactive" ("batch" for /run_batch).
 
     Returns:
         FastAPI application instance
     """
-    app = FastAPI()
+    app = FastAPI(lifespan=_lifespan(agent))
+    admission = AdmissionController()
+    limiter = rate_limit.get_limiter()
 
     @app.post("/run")
-    async def run(payload: dict):
+    async def run(payload: dict, request: Request):
         """Standard A2A protocol endpoint"""
-        return await agent.execute(payload)
+        scope = _RequestScope(admission, name, "run", request)
+        try:
+            await scope.admit()
+        except Overloaded as e:
+            return _overloaded(e)
+        status = "error"
+        try:
+            with scope.activate():
+                result = await agent.execute(payload)
+                status = "ok"
+                return scope.with_timings(result)
+        finally:
+            scope.finish(status)
+
+    if hasattr(agent, "stream"):
+        @app.post("/run_stream")
+        async def run_stream(payload: dict, request: Request):
+            """Streaming variant of /run: one JSON object per line (NDJSON)"""
+            scope = _RequestScope(admission, name, "run_stream", request)
+            try:
+                await scope.admit()
+            except Overloaded as e:
+                return _overloaded(e)
+            try:
+                events = agent.stream(payload)
+            except Exception:
+                scope.finish("error")
+                raise
+            return _ndjson(events, scope)
+
+    @app.post("/run_batch")
+    async def run_batch(batch: dict, request: Request):
+        """
+        Run many payloads in one call: {"items": [...], "concurrency": n,
+        "ordered": true}. Streams one NDJSON line per item,
+        {"index": i, "result": ...} or {"index": i, "error": "..."}.
+        Concurrency is capped at A2A_BATCH_CONCURRENCY; a malformed body
+        is rejected with 400.
+        """
+        try:
+            items, concurrency, ordered = _batch_params(batch)
+        except ValueError as e:
+            return _bad_request(str(e))
+
+        # A batch counts against the concurrency limit as the items it runs at once
+        scope = _RequestScope(admission, name, "run_batch", request, priority="batch",
+                              slots=min(concurrency, len(items)))
+        try:
+            await scope.admit()
+        except Overloaded as e:
+            return _overloaded(e)
+
+        try:
+            if hasattr(agent, "execute_batch"):
+                results = agent.execute_batch(items, concurrency, ordered)
+            else:
+                results = iter_batch(agent.execute, items, concurrency, ordered)
+        except Exception:
+            scope.finish("error")
+            raise
+        return _ndjson(results, scope)
 
     @app.get("/health")
     async def health():
         """Health check endpoint"""
-        return {"status": "healthy"}
+        if not getattr(app.state, "ready", False):
+            return JSONResponse(status_code=503, content={"status": "warming_up"})
+        status = {"status": "healthy", "admission": admission.stats()}
+        if limiter.enabled:
+            status["rate_limit"] = limiter.stats()
+        if hasattr(agent, "stats"):
+            status["stats"] = agent.stats()
+        return status
+
+    @app.get("/metrics")
+    async def metrics():
+        """Prometheus metrics endpoint"""
+        record_stats(name, {"admission": admission.stats()})
+        if limiter.enabled:
+            record_stats(name, {"rate_limit": limiter.stats()})
+        if hasattr(agent, "stats"):
+            record_stats(name, agent.stats())
+        return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
     return app
@@ -0,0 +1,135 @@
+import asyncio
+import contextlib
+import math
+import os
+import time
+
+# Admission control for /run endpoints (set A2A_MAX_CONCURRENCY=0 to disable)
+MAX_CONCURRENCY = int(os.getenv("A2A_MAX_CONCURRENCY", "32"))
+MAX_QUEUE = int(os.getenv("A2A_MAX_QUEUE", "64"))
+QUEUE_TIMEOUT = float(os.getenv("A2A_QUEUE_TIMEOUT", "10"))
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted; carries a Retry-After hint in seconds"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Concurrency limiter with a bounded wait queue.
+
+    Up to ``max_concurrency`` requests run at once and up to ``max_queue`` more
+    wait for a slot. A request running several model calls at once, such as
+    a batch, takes one slot per call. Requests beyond that, or that wait longer than
+    ``queue_timeout`` seconds, are rejected with Overloaded so the server can
+    shed load quickly instead of letting every request time out.
+    """
+
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, max_queue=MAX_QUEUE, queue_timeout=QUEUE_TIMEOUT):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._gathering = asyncio.Lock()
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.last_wait = 0.0
+        # Moving average of how long an admitted request holds its slot
+        self._service_time = 1.0
+
+    @property
+    def enabled(self):
+        return self.max_concurrency > 0
+
+    def retry_after(self):
+        """Seconds a rejected client should wait, from queue depth and service time"""
+        slots = max(1, self.max_concurrency)
+        return max(1, math.ceil(self._service_time * (self.waiting + 1) / slots))
+
+    async def acquire(self, slots=1):
+        """
+        Wait for slots.
+
+        Args:
+            slots: Slots to take, e.g. the number of items a batch runs at
+                once; capped at max_concurrency
+
+        Returns:
+            Admission start time, to be passed back to release()
+
+        Raises:
+            Overloaded: If the wait queue is full or the wait timed out
+        """
+        if not self.enabled:
+            self.in_flight += 1
+            return time.monotonic()
+
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded("queue full", self.retry_after())
+
+        slots = min(max(1, slots), self.max_concurrency)
+        taken = 0
+
+        async def take():
+            # One multi-slot caller gathers at a time, so two batches can
+            # never each hold part of what they need and wait on each other
+            nonlocal taken
+            async with self._gathering if slots > 1 else contextlib.nullcontext():
+                while taken < slots:
+                    await self._semaphore.acquire()
+                    taken += 1
+
+        self.waiting += 1
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(take(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            for _ in range(taken):
+                self._semaphore.release()
+            self.rejected += 1
+            raise Overloaded("timed out waiting for a slot", self.retry_after())
+        finally:
+            self.waiting -= 1
+
+        admitted_at = time.monotonic()
+        wait = admitted_at - start
+        self.admitted += 1
+        self.total_wait += wait
+        self.last_wait = wait
+        self.max_wait = max(self.max_wait, wait)
+        self.in_flight += slots
+        return admitted_at
+
+    def release(self, admitted_at, slots=1):
+        """Free the slots taken by acquire()"""
+        if not self.enabled:
+            self.in_flight -= 1
+            return
+        slots = min(max(1, slots), self.max_concurrency)
+        self.in_flight -= slots
+        held = time.monotonic() - admitted_at
+        self._service_time = 0.9 * self._service_time + 0.1 * held
+        for _ in range(slots):
+            self._semaphore.release()
+
+    def stats(self):
+        """Queue depth, wait times and rejection counters"""
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_wait_seconds": self.total_wait / self.admitted if self.admitted else 0.0,
+            "max_wait_seconds": self.max_wait,
+            "last_wait_seconds": self.last_wait,
+        }
@@ -0,0 +1,49 @@
+import asyncio
+import os
+
+# Default number of batch items run concurrently by /run_batch
+BATCH_CONCURRENCY = int(os.getenv("A2A_BATCH_CONCURRENCY", "8"))
+
+
+def describe_error(error):
+    """Message reported for a failed batch item; a missing payload field is named as such"""
+    if isinstance(error, KeyError):
+        return f"invalid request: missing field {error.args[0]!r}"
+    return str(error)
+
+
+async def iter_batch(execute, payloads, concurrency=BATCH_CONCURRENCY, ordered=True):
+    """
+    Run execute(payload) for every payload with bounded concurrency.
+
+    Args:
+        execute: Async callable taking one payload
+        payloads: List of payloads
+        concurrency: Maximum number of payloads running at once
+        ordered: Yield results in input order (True) or as they complete (False)
+
+    Yields:
+        {"index": i, "result": ...} per item, or {"index": i, "error": "..."}
+        if that item raised
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run_one(index, payload):
+        async with semaphore:
+            try:
+                return {"index": index, "result": await execute(payload)}
+            except Exception as e:
+                return {"index": index, "error": describe_error(e)}
+
+    tasks = [asyncio.ensure_future(run_one(i, payload)) for i, payload in enumerate(payloads)]
+    try:
+        if ordered:
+            for task in tasks:
+                yield await task
+        else:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+    finally:
+        # Client went away mid-batch: stop the remaining items
+        for task in tasks:
+            task.cancel()
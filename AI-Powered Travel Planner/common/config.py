@@ -0,0 +1,6 @@
+import os
+
+# Directory holding the agents' local state (plan request history, usage
+# rollups); the default is the project's cache/ directory wherever the
+# agents are started from
+DATA_DIR = os.getenv("AGENT_DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache"))
@@ -0,0 +1,175 @@
+import asyncio
+import json
+import os
+import random
+import re
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+from pydantic import BaseModel
+
+# Simulated model behaviour, configured per process
+LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "800"))
+# "fixed", "uniform" (LATENCY_MS +/- SPREAD fraction) or "lognormal"
+# (median LATENCY_MS, sigma SPREAD) for a realistic long tail
+LATENCY_DIST = os.getenv("FAKE_LLM_LATENCY_DIST", "lognormal").lower()
+LATENCY_SPREAD = float(os.getenv("FAKE_LLM_LATENCY_SPREAD", "0.4"))
+# Fraction of calls that raise, like a quota or server error from Gemini
+FAILURE_RATE = float(os.getenv("FAKE_LLM_FAILURE_RATE", "0"))
+# Fraction of answers wrapped in ```json fences, as Gemini sometimes does
+FENCED_RATE = float(os.getenv("FAKE_LLM_FENCED_RATE", "0"))
+# Optional JSON file mapping a result key ("flights", ...) to the answer to return
+RESPONSES_PATH = os.getenv("FAKE_LLM_RESPONSES")
+SEED = os.getenv("FAKE_LLM_SEED")
+# Per-model overrides as JSON, to exercise model tier failover, e.g.
+# {"gemini-2.5-flash": {"latency_ms": 15000, "failure_rate": 0.5}}
+MODEL_OVERRIDES = json.loads(os.getenv("FAKE_LLM_MODELS", "{}"))
+# Implicit prompt caching: a system instruction seen before is reported as
+# cached tokens once it is at least this long (Gemini 2.5 Flash: 1024 tokens)
+CACHE_MIN_TOKENS = int(os.getenv("FAKE_LLM_CACHE_MIN_TOKENS", "1024"))
+# Characters per partial response when the answer is streamed
+STREAM_CHUNK_CHARS = 32
+
+_random = random.Random(SEED)
+
+# Canned answers keyed by the JSON key the agent asks for
+CANNED_RESPONSES = {
+    "flights": {"flights": [
+        {"airline": "Air France", "departure_time": "08:15", "arrival_time": "21:40",
+         "duration": "7h 25m", "price": 640},
+        {"airline": "Delta", "departure_time": "17:30", "arrival_time": "07:05",
+         "duration": "7h 35m", "price": 710},
+        {"airline": "United", "departure_time": "22:00", "arrival_time": "11:20",
+         "duration": "7h 20m", "price": 585},
+    ]},
+    "stays": {"stays": [
+        {"name": "Hotel Lumiere", "location": "City Centre", "rating": 4.5,
+         "price_per_night": 180, "amenities": ["WiFi", "Breakfast", "Gym"]},
+        {"name": "Riverside Suites", "location": "Old Town", "rating": 4.2,
+         "price_per_night": 140, "amenities": ["WiFi", "Kitchenette"]},
+        {"name": "Budget Inn", "location": "Station Quarter", "rating": 3.8,
+         "price_per_night": 85, "amenities": ["WiFi"]},
+    ]},
+    "activities": {"activities": [
+        {"name": "Guided Walking Tour", "description": "Three-hour tour of the historic centre.",
+         "price": 35, "duration_hours": 3},
+        {"name": "Museum Pass", "description": "Entry to the main museums for one day.",
+         "price": 60, "duration_hours": 6},
+        {"name": "River Cruise", "description": "Evening cruise with city views.",
+         "price": 25, "duration_hours": 1.5},
+    ]},
+}
+
+# A key whose value is a list of objects: "flights": [{...
+_RESULT_KEY = re.compile(r'\\?"(\w+)\\?"\s*:\s*\[\s*\{')
+
+
+def _load_responses():
+    if not RESPONSES_PATH:
+        return CANNED_RESPONSES
+    with open(RESPONSES_PATH) as f:
+        return {**CANNED_RESPONSES, **json.load(f)}
+
+
+def _latency(latency_ms):
+    """Seconds to wait before answering, drawn from the configured distribution"""
+    if LATENCY_DIST == "fixed":
+        ms = latency_ms
+    elif LATENCY_DIST == "uniform":
+        ms = latency_ms * _random.uniform(1 - LATENCY_SPREAD, 1 + LATENCY_SPREAD)
+    else:
+        ms = latency_ms * _random.lognormvariate(0, LATENCY_SPREAD)
+    return max(0.0, ms) / 1000
+
+
+class FakeLlm(BaseLlm):
+    """
+    Offline stand-in for Gemini with configurable latency, failures and answers.
+
+    The answer is picked from the agent's response schema, or the JSON format
+    requested in its instruction ({"flights": [...]}, ...), so every
+    specialist, and the fused planner asking for all of them, gets a
+    plausible response. Usage metadata is estimated at four characters per
+    token, and answers longer than max_output_tokens are cut off. Streamed
+    answers arrive in small partial chunks followed by the full response.
+    Repeated system instructions of at least CACHE_MIN_TOKENS are reported
+    as cached prompt tokens, like Gemini's implicit caching. Latency and
+    failure rate can be set per model through FAKE_LLM_MODELS.
+    """
+
+    responses: dict = {}
+    seen_instructions: set = set()
+    latency_ms: float = LATENCY_MS
+    failure_rate: float = FAILURE_RATE
+
+    def model_post_init(self, context):
+        super().model_post_init(context)
+        if not self.responses:
+            self.responses = _load_responses()
+        overrides = MODEL_OVERRIDES.get(self.model.removeprefix("fake-"), {})
+        self.latency_ms = overrides.get("latency_ms", self.latency_ms)
+        self.failure_rate = overrides.get("failure_rate", self.failure_rate)
+
+    async def generate_content_async(self, llm_request, stream=False):
+        latency = _latency(self.latency_ms)
+        # A streamed answer starts arriving after a third of the total latency
+        await asyncio.sleep(latency / 3 if stream else latency)
+        if _random.random() < self.failure_rate:
+            raise RuntimeError("429 RESOURCE_EXHAUSTED (simulated by FakeLlm)")
+
+        instruction = str(llm_request.config.system_instruction or "") if llm_request.config else ""
+        schema = llm_request.config.response_schema if llm_request.config else None
+        # Keys come from the response schema if the agent has one, else from the
+        # format spelled out in its instruction
+        if isinstance(schema, type) and issubclass(schema, BaseModel):
+            keys = list(schema.model_fields)
+        else:
+            keys = _RESULT_KEY.findall(instruction)
+        # One canned answer per requested key; a combined format gets them merged
+        answers = [self.responses[key] for key in keys if key in self.responses]
+        if len(answers) == 1 and isinstance(answers[0], str):
+            text = answers[0]
+        else:
+            merged = {}
+            for answer in answers:
+                merged.update(json.loads(answer) if isinstance(answer, str) else answer)
+            text = json.dumps(merged or {"result": []})
+        # Like Gemini, never fence an answer constrained by a response schema
+        if schema is None and _random.random() < FENCED_RATE:
+            text = f"```json\n{text}\n```"
+
+        prompt_chars = len(instruction) + sum(
+            len(part.text or "") for content in llm_request.contents for part in content.parts or ()
+        )
+        prompt_tokens, output_tokens = prompt_chars // 4, len(text) // 4
+        cached_tokens = None
+        if len(instruction) // 4 >= CACHE_MIN_TOKENS:
+            if instruction in self.seen_instructions:
+                cached_tokens = len(instruction) // 4
+            self.seen_instructions.add(instruction)
+
+        # Cut the answer off at the output token cap, like Gemini does
+        cap = llm_request.config.max_output_tokens if llm_request.config else None
+        finish_reason = types.FinishReason.STOP
+        if cap and output_tokens > cap:
+            text, output_tokens = text[:cap * 4], cap
+            finish_reason = types.FinishReason.MAX_TOKENS
+
+        if stream:
+            chunks = [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)]
+            for chunk in chunks:
+                await asyncio.sleep(latency * 2 / 3 / len(chunks))
+                yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=chunk)]), partial=True)
+
+        # Final aggregated response, as ADK's Gemini model yields after streaming
+        yield LlmResponse(
+            content=types.Content(role="model", parts=[types.Part(text=text)]),
+            finish_reason=finish_reason,
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=prompt_tokens,
+                cached_content_token_count=cached_tokens,
+                candidates_token_count=output_tokens,
+                total_token_count=prompt_tokens + output_tokens,
+            ),
+        )
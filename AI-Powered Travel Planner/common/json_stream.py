@@ -0,0 +1,79 @@
+import json
+
+
+class ItemStreamParser:
+    """
+    Incremental parser pulling complete items out of streamed model JSON.
+
+    Feed it text chunks as the model produces them; it returns every object
+    in the watched top-level arrays (e.g. {"flights": [{...}, {...}]}) as soon
+    as the object's closing brace arrives, without waiting for the rest of
+    the document. Text around the JSON, such as ```json fences, is ignored.
+    """
+
+    def __init__(self, keys):
+        """
+        Args:
+            keys: Top-level keys whose arrays hold the items, e.g. ("flights",)
+        """
+        self.keys = set(keys)
+        self._buffer = ""
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = None
+        self._last_string = None
+        self._array_key = None
+        self._item_start = None
+
+    def feed(self, chunk):
+        """
+        Consume the next chunk of model output.
+
+        Returns:
+            List of (key, item) pairs completed by this chunk
+        """
+        completed = []
+        start = len(self._buffer)
+        self._buffer += chunk
+        for position, char in enumerate(chunk, start):
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        # Possibly a top-level key; remember it for the next "["
+                        self._last_string = self._buffer[self._string_start + 1:position]
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = position
+            elif char in "{[":
+                self._depth += 1
+                if char == "[" and self._depth == 2 and self._last_string in self.keys:
+                    self._array_key = self._last_string
+                elif char == "{" and self._depth == 3 and self._array_key is not None:
+                    self._item_start = position
+            elif char in "}]":
+                if char == "}" and self._depth == 3 and self._item_start is not None:
+                    item = self._decode(self._item_start, position + 1)
+                    if item is not None:
+                        completed.append((self._array_key, item))
+                    self._item_start = None
+                elif char == "]" and self._depth == 2:
+                    self._array_key = None
+                self._depth -= 1
+            elif char == "," and self._depth == 1:
+                self._last_string = None
+        return completed
+
+    def _decode(self, start, end):
+        try:
+            item = json.loads(self._buffer[start:end])
+        except json.JSONDecodeError:
+            return None
+        return item if isinstance(item, dict) else None
@@ -0,0 +1,175 @@
+import bisect
+import threading
+
+# Latency buckets in seconds, spanning cache hits to slow model calls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Distribution of observations in cumulative buckets"""
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    labels = _format_labels(self.label_names, key, [("le", _format_value(bound))])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.label_names, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Process-wide collection of metrics rendered in Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help_text, labels, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, help_text, labels, **kwargs)
+                self._metrics[name] = metric
+            return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._get_or_create(Counter, name, help_text, labels)
+
+    def gauge(self, name, help_text, labels=()):
+        return self._get_or_create(Gauge, name, help_text, labels)
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, labels, buckets=buckets)
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Metrics shared across modules
+REQUEST_LATENCY = REGISTRY.histogram(
+    "a2a_request_duration_seconds", "Time spent serving A2A requests", ("agent", "endpoint", "status"))
+REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "a2a_requests_in_flight", "A2A requests currently being served", ("agent",))
+ADMISSION_WAIT = REGISTRY.histogram(
+    "a2a_admission_wait_seconds", "Time requests waited in the admission queue", ("agent",))
+DOWNSTREAM_LATENCY = REGISTRY.histogram(
+    "a2a_downstream_duration_seconds", "Latency of calls to other agents", ("target", "status"))
+MODEL_LATENCY = REGISTRY.histogram(
+    "agent_model_call_duration_seconds", "Latency of model (Gemini) calls", ("agent", "model"))
+JSON_PARSE_FAILURES = REGISTRY.counter(
+    "agent_json_parse_failures_total", "Model responses that were not the expected JSON", ("agent",))
+TRUNCATIONS = REGISTRY.counter(
+    "agent_truncated_responses_total", "Model answers cut off by the output token cap", ("agent",))
+MODEL_TOKENS = REGISTRY.counter(
+    "agent_model_tokens_total", "Tokens reported in model usage metadata", ("agent", "model", "type"))
+MODEL_SERVED = REGISTRY.counter(
+    "agent_model_served_total", "Model calls by the model tier that answered them", ("agent", "model"))
+MODEL_FAILOVERS = REGISTRY.counter(
+    "agent_model_failovers_total", "Calls moved off a model tier, by reason (latency or quota)", ("model", "reason"))
+RATE_LIMIT_WAIT = REGISTRY.histogram(
+    "agent_rate_limit_wait_seconds", "Time model calls queued for the rate limiter", ("model", "priority"))
+PLAN_TOKENS = REGISTRY.counter(
+    "host_plan_tokens_total", "Tokens spent on plans, by agent and type (prompt, cached, output, total)", ("agent", "type"))
+PLAN_COST = REGISTRY.counter(
+    "host_plan_cost_usd_total", "Estimated model cost of plans in USD, by agent", ("agent",))
+PLAN_LATENCY = REGISTRY.histogram(
+    "host_plan_duration_seconds", "End-to-end time to build a plan, by planning mode", ("mode", "cached"))
+AGENT_STAT = REGISTRY.gauge(
+    "a2a_agent_stat", "Agent counters also reported by /health (caches, coalescing, sessions)", ("agent", "stat"))
+
+
+def record_stats(agent, stats, prefix=""):
+    """Flatten a nested stats dict from /health into the a2a_agent_stat gauge"""
+    for key, value in stats.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            record_stats(agent, value, f"{name}_")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            AGENT_STAT.set(value, agent=agent, stat=name)
@@ -0,0 +1,138 @@
+import asyncio
+import time
+
+from google.adk.models.base_llm import BaseLlm
+
+from common.metrics import MODEL_FAILOVERS
+from common.rate_limited_llm import estimate_prompt_tokens
+
+# HTTP status codes of errors worth retrying on another tier: quota exhausted
+# and model overloaded
+FAILOVER_CODES = (429, 503)
+
+
+class FailoverError(Exception):
+    """Raised when a tier is abandoned, with the reason: latency or quota"""
+
+    def __init__(self, message, reason):
+        super().__init__(message)
+        self.reason = reason
+
+
+def _is_quota_error(error):
+    """True for Gemini quota and overload errors (google.genai APIError or its message)"""
+    if getattr(error, "code", None) in FAILOVER_CODES:
+        return True
+    message = str(error)
+    return "RESOURCE_EXHAUSTED" in message or "UNAVAILABLE" in message
+
+
+class ModelRouter(BaseLlm):
+    """
+    Model that serves each call from the first healthy tier in a list.
+
+    Tiers are ordered best first (e.g. gemini-2.5-flash, then
+    gemini-2.5-flash-lite). A tier that fails with a quota or overload error,
+    or runs past its budget, is abandoned for the next one and skipped for
+    ``cooldown`` seconds, so later calls go straight to a tier that works.
+    Streamed calls must produce their first chunk within ``latency_budget``
+    seconds; non-streamed calls, whose first response is the whole answer,
+    get ``response_budget`` seconds, or are waited on when it is 0. The last
+    tier always gets the call, without a budget. Once a tier has started
+    answering it finishes the call; failover never mixes output from two
+    models.
+
+    Every response is tagged with the tier that served it in
+    ``custom_metadata["model"]``. Tiers abandoned after their budget ran out
+    may already have been billed for the prompt, so the final response also
+    lists them under ``custom_metadata["abandoned"]`` as
+    {"model", "usage"} entries with an estimated prompt token count.
+    """
+
+    tiers: list[BaseLlm]
+    latency_budget: float
+    response_budget: float = 0.0
+    cooldown: float
+    cooling_until: dict = {}
+
+    @property
+    def capabilities(self):
+        return self.tiers[0].capabilities
+
+    def healthy_tiers(self):
+        """Tiers not cooling down after a failure, or every tier if none are"""
+        now = time.monotonic()
+        healthy = [tier for tier in self.tiers if self.cooling_until.get(tier.model, 0) <= now]
+        return healthy or list(self.tiers)
+
+    async def generate_content_async(self, llm_request, stream=False):
+        tiers = self.healthy_tiers()
+        budget = (self.latency_budget if stream else self.response_budget) or None
+        abandoned = []
+        for index, tier in enumerate(tiers):
+            last = index == len(tiers) - 1
+            # Each tier gets its own copy, as models may adjust the request
+            attempt = llm_request.model_copy(deep=True)
+            attempt.model = tier.model
+            responses = tier.generate_content_async(attempt, stream=stream)
+            try:
+                first = await self._first_response(responses, budget, last)
+            except FailoverError as e:
+                await responses.aclose()
+                self._cool_down(tier, e)
+                if e.reason == "latency":
+                    abandoned.append(_abandoned(tier, attempt))
+                print(f"↪️  {tier.model} {e}, failing over to {tiers[index + 1].model}")
+                continue
+
+            self.cooling_until.pop(tier.model, None)
+            if first is None:
+                return
+            yield _tagged(first, tier, abandoned)
+            async for response in responses:
+                yield _tagged(response, tier, abandoned)
+            return
+
+    async def _first_response(self, responses, budget, last=False):
+        """
+        Wait for a tier's first response.
+
+        Args:
+            responses: The tier's response generator
+            budget: Seconds to wait, or None to wait as long as it takes
+            last: The tier is the last one, which is waited on and whose
+                errors are raised as they are
+
+        Returns:
+            The first response, or None if the tier produced none
+
+        Raises:
+            FailoverError: The budget ran out, or the tier is out of quota
+        """
+        try:
+            return await asyncio.wait_for(anext(responses, None), None if last else budget)
+        except asyncio.TimeoutError:
+            raise FailoverError(f"exceeded its {budget:g}s latency budget", "latency") from None
+        except Exception as e:
+            if not last and _is_quota_error(e):
+                raise FailoverError(f"is out of quota ({e})", "quota") from e
+            raise
+
+    def _cool_down(self, tier, error):
+        MODEL_FAILOVERS.inc(model=tier.model, reason=error.reason)
+        self.cooling_until[tier.model] = time.monotonic() + self.cooldown
+
+
+def _abandoned(tier, attempt):
+    """Usage entry for a tier attempt abandoned mid-call: its prompt, as far as we can tell"""
+    tokens = estimate_prompt_tokens(attempt)
+    return {"model": tier.model, "usage": {"prompt_token_count": tokens, "total_token_count": tokens}}
+
+
+def _tagged(response, tier, abandoned=()):
+    """Record the serving tier, and on the final response any abandoned tiers, on a response"""
+    metadata = {**(response.custom_metadata or {}), "model": tier.model}
+    if abandoned and not response.partial:
+        metadata["abandoned"] = list(abandoned)
+    response.custom_metadata = metadata
+    return response
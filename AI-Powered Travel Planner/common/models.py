@@ -0,0 +1,81 @@
+import os
+from common.rate_limit import MODEL_RPM, MODEL_TPM
+
+# Model backend for the specialist agents: "gemini" (default) or "fake" for
+# offline load tests with no API key or network (see common/fake_llm.py)
+MODEL_BACKEND = os.getenv("AGENT_MODEL_BACKEND", "gemini").lower()
+
+# Gemini tiers to fail over across, best first, e.g.
+# "gemini-2.5-pro,gemini-2.5-flash,gemini-2.5-flash-lite". An agent whose model
+# is listed fails over down the list (see common/model_router.py); unset, every
+# agent runs on its own model alone. AGENT_MODEL_<AGENT> picks an agent's
+# model, e.g. AGENT_MODEL_FLIGHT=gemini-2.5-pro
+MODEL_TIERS = [model.strip() for model in os.getenv("AGENT_MODEL_TIERS", "").split(",") if model.strip()]
+# Seconds a tier may take to stream its first chunk before the call moves to the next one
+MODEL_LATENCY_BUDGET = float(os.getenv("AGENT_MODEL_LATENCY_BUDGET", "10"))
+# Seconds a tier may take to return a whole non-streamed answer (0 waits for it)
+MODEL_RESPONSE_BUDGET = float(os.getenv("AGENT_MODEL_RESPONSE_BUDGET", "0"))
+# Seconds a tier that was too slow or out of quota is skipped for
+MODEL_COOLDOWN = float(os.getenv("AGENT_MODEL_COOLDOWN", "60"))
+
+
+def model_tiers(model, agent=None):
+    """
+    Models an agent may be served by, best first.
+
+    Args:
+        model: The agent's default model, e.g. "gemini-2.5-flash"
+        agent: Short agent name; AGENT_MODEL_<AGENT> overrides the model
+
+    Returns:
+        The agent's model followed by the tiers below it in MODEL_TIERS, or
+        just the agent's model if it is not one of them
+    """
+    if agent:
+        model = os.getenv(f"AGENT_MODEL_{agent.upper()}", model)
+    if model not in MODEL_TIERS:
+        return [model]
+    return MODEL_TIERS[MODEL_TIERS.index(model):]
+
+
+def create_model(model, agent=None, **config):
+    """
+    Build the model an agent runs on.
+
+    Args:
+        model: Gemini model name, e.g. "gemini-2.5-flash"
+        agent: Short agent name, used to look up a per-agent model override
+        **config: Extra Gemini fields, e.g. retry_options. Sampling settings
+            and token caps belong in the agent's generate_content_config
+
+    Returns:
+        A Gemini model (a FakeLlm when AGENT_MODEL_BACKEND=fake), wrapped in a
+        ModelRouter when lower tiers are available to fail over to. Each tier
+        is rate limited when AGENT_MODEL_RPM or AGENT_MODEL_TPM is set
+    """
+    models = [_build(name, **config) for name in model_tiers(model, agent)]
+    if len(models) == 1:
+        return models[0]
+
+    from common.model_router import ModelRouter
+    return ModelRouter(
+        model=models[0].model,
+        tiers=models,
+        latency_budget=MODEL_LATENCY_BUDGET,
+        response_budget=MODEL_RESPONSE_BUDGET,
+        cooldown=MODEL_COOLDOWN,
+    )
+
+
+def _build(model, **config):
+    if MODEL_BACKEND == "fake":
+        from common.fake_llm import FakeLlm
+        llm = FakeLlm(model=f"fake-{model}")
+    else:
+        from google.adk.models import Gemini
+        llm = Gemini(model=model, **config)
+
+    if not (MODEL_RPM or MODEL_TPM):
+        return llm
+    from common.rate_limited_llm import RateLimitedLlm
+    return RateLimitedLlm(model=llm.model, llm=llm)
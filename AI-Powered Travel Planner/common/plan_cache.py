@@ -0,0 +1,80 @@
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Bounded in-process cache with per-entry TTL, LRU eviction and a
+    stale-while-revalidate window.
+
+    Entries younger than ``ttl`` are fresh. Entries older than ``ttl`` but
+    younger than ``ttl + stale_ttl`` are still served, flagged as stale, so the
+    caller can refresh them in the background. Anything older is a miss.
+    """
+
+    def __init__(self, max_entries=1024, ttl=900.0, stale_ttl=300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Look up a key.
+
+        Args:
+            key: Hashable cache key
+
+        Returns:
+            Tuple of (value, state) where state is "fresh", "stale" or None on a miss
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None, None
+
+        stored_at, value = entry
+        age = time.monotonic() - stored_at
+        if age > self.ttl + self.stale_ttl:
+            del self._entries[key]
+            self.misses += 1
+            return None, None
+
+        self._entries.move_to_end(key)
+        if age > self.ttl:
+            self.stale_hits += 1
+            return value, "stale"
+        self.hits += 1
+        return value, "fresh"
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entries if full"""
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def age(self, key):
+        """Seconds since key was stored, or None if it is not cached (not counted as a hit or miss)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        age = time.monotonic() - entry[0]
+        return age if age <= self.ttl + self.stale_ttl else None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,264 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from common.metrics import RATE_LIMIT_WAIT
+
+# Per-model Gemini quotas to stay under (0 disables the limit), e.g. the paid
+# tier 1 for gemini-2.5-flash: 1000 requests and 1,000,000 tokens per minute
+MODEL_RPM = int(os.getenv("AGENT_MODEL_RPM", "0"))
+MODEL_TPM = int(os.getenv("AGENT_MODEL_TPM", "0"))
+# SQLite file holding the buckets, shared by every agent process using the
+# same path; without it each process limits itself alone
+STATE_PATH = os.getenv("AGENT_RATE_LIMIT_PATH")
+# Longest a queued caller sleeps before checking the buckets again; other
+# processes may have freed or taken capacity meanwhile
+MAX_POLL = 1.0
+
+# Queue order for callers waiting on the limiter, most urgent first
+PRIORITIES = {"interactive": 0, "batch": 1, "background": 2}
+PRIORITY_HEADER = "x-request-priority"
+_priority = contextvars.ContextVar("request_priority", default="interactive")
+
+
+@contextmanager
+def priority(name):
+    """Run a block at a request priority (interactive, batch or background)"""
+    token = _priority.set(name if name in PRIORITIES else "interactive")
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+def inject(headers):
+    """Add the current request priority to outgoing A2A headers"""
+    headers[PRIORITY_HEADER] = _priority.get()
+    return headers
+
+
+class LocalBuckets:
+    """Token buckets held in this process"""
+
+    def __init__(self):
+        self._levels = {}
+        self._lock = threading.Lock()
+
+    async def take(self, buckets, now):
+        with self._lock:
+            return _take(self._levels, buckets, now)
+
+    async def adjust(self, key, amount, capacity, now):
+        with self._lock:
+            _adjust(self._levels, key, amount, capacity, now)
+
+
+class SharedBuckets:
+    """
+    Token buckets in a SQLite file, shared by every process using the path.
+
+    Each update runs in an IMMEDIATE transaction, which takes the database's
+    write lock, so concurrent processes never spend the same tokens twice.
+    Transactions run in a worker thread: waiting for another process's lock
+    must not block the event loop.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, level REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+
+    async def take(self, buckets, now):
+        return await asyncio.to_thread(
+            self._transaction, lambda levels: _take(levels, buckets, now), [b[0] for b in buckets]
+        )
+
+    async def adjust(self, key, amount, capacity, now):
+        await asyncio.to_thread(
+            self._transaction, lambda levels: _adjust(levels, key, amount, capacity, now), [key]
+        )
+
+    def _transaction(self, update, keys):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                marks = ",".join("?" * len(keys))
+                levels = {key: (level, updated) for key, level, updated in self._conn.execute(
+                    f"SELECT key, level, updated FROM buckets WHERE key IN ({marks})", keys)}
+                before = dict(levels)
+                result = update(levels)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO buckets (key, level, updated) VALUES (?, ?, ?)",
+                    [(key, *value) for key, value in levels.items() if before.get(key) != value],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return result
+
+
+def _level(levels, key, capacity, now):
+    """Bucket level refilled up to now; a bucket starts full"""
+    level, updated = levels.get(key, (capacity, now))
+    return min(capacity, level + (now - updated) * capacity / 60)
+
+
+def _take(levels, buckets, now):
+    """
+    Take from every bucket if all hold enough, else take nothing.
+
+    Args:
+        levels: key -> (level, updated) state, updated in place
+        buckets: (key, amount, per-minute capacity) per bucket
+        now: Current wall clock time
+
+    Returns:
+        0 if taken, else seconds until every bucket will hold enough
+    """
+    wait = 0.0
+    current = {}
+    for key, amount, capacity in buckets:
+        current[key] = _level(levels, key, capacity, now)
+        # A single call larger than the bucket only waits for a full one
+        amount = min(amount, capacity)
+        if current[key] < amount:
+            wait = max(wait, (amount - current[key]) * 60 / capacity)
+    if wait > 0:
+        return wait
+    for key, amount, capacity in buckets:
+        levels[key] = (current[key] - min(amount, capacity), now)
+    return 0.0
+
+
+def _adjust(levels, key, amount, capacity, now):
+    """Return (amount > 0) or charge (amount < 0) tokens; a bucket may go into debt"""
+    levels[key] = (min(capacity, _level(levels, key, capacity, now) + amount), now)
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute limiter for model calls.
+
+    Each model has a request bucket and a token bucket refilling at rpm and
+    tpm per minute. A call takes one request and its estimated tokens, and
+    once it finishes the estimate is corrected to the tokens the model
+    reported. Callers that find the buckets short queue, most urgent
+    priority first and then in arrival order, instead of sending a request
+    the model would reject for quota.
+    """
+
+    def __init__(self, rpm=MODEL_RPM, tpm=MODEL_TPM, path=STATE_PATH):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.shared = bool(path) and self.enabled
+        self.store = SharedBuckets(path) if self.shared else LocalBuckets()
+        self._queues = {}
+        self._order = itertools.count()
+
+        self.waiting = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+
+    @property
+    def enabled(self):
+        return self.rpm > 0 or self.tpm > 0
+
+    def _buckets(self, model, tokens):
+        buckets = []
+        if self.rpm > 0:
+            buckets.append((f"{model}:requests", 1, self.rpm))
+        if self.tpm > 0:
+            buckets.append((f"{model}:tokens", tokens, self.tpm))
+        return buckets
+
+    async def acquire(self, model, tokens, priority=None):
+        """
+        Wait until a call to model may be sent.
+
+        Args:
+            model: Model name; each model has its own quota
+            tokens: Estimated prompt plus output tokens of the call
+            priority: Queue priority (default: the current request's)
+        """
+        if not self.enabled:
+            return
+        buckets = self._buckets(model, tokens)
+        queue = self._queues.setdefault(model, [])
+        if not queue and await self.store.take(buckets, time.time()) == 0:
+            return
+
+        priority = priority or current_priority()
+        start = time.monotonic()
+        turn = asyncio.Event()
+        entry = (PRIORITIES.get(priority, 0), next(self._order), turn)
+        heapq.heappush(queue, entry)
+        self.waiting += 1
+        self.throttled += 1
+        try:
+            while True:
+                if queue[0] is not entry:
+                    turn.clear()
+                    await turn.wait()
+                    continue
+                wait = await self.store.take(buckets, time.time())
+                if wait == 0:
+                    return
+                # A more urgent caller arriving meanwhile takes over the head
+                try:
+                    await asyncio.wait_for(turn.wait(), min(wait, MAX_POLL))
+                    turn.clear()
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            queue.remove(entry)
+            heapq.heapify(queue)
+            self.waiting -= 1
+            waited = time.monotonic() - start
+            self.total_wait += waited
+            RATE_LIMIT_WAIT.observe(waited, model=model, priority=priority)
+            if queue:
+                queue[0][2].set()
+
+    async def settle(self, model, estimated, actual):
+        """Correct a call's token estimate to the tokens the model reported"""
+        if self.tpm > 0 and actual is not None and actual != estimated:
+            await self.store.adjust(f"{model}:tokens", estimated - actual, self.tpm, time.time())
+
+    def stats(self):
+        """Limiter counters for the /health endpoint"""
+        return {
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "shared": self.shared,
+            "waiting": self.waiting,
+            "throttled": self.throttled,
+            "total_wait_s": round(self.total_wait, 3),
+        }
+
+
+_limiter = None
+
+
+def get_limiter():
+    """Process-wide limiter shared by every agent running in this process"""
+    global _limiter
+    if _limiter is None:
+        _limiter = RateLimiter()
+    return _limiter
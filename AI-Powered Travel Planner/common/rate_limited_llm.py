@@ -0,0 +1,51 @@
+from google.adk.models.base_llm import BaseLlm
+
+from common.rate_limit import get_limiter
+
+
+def estimate_prompt_tokens(llm_request):
+    """Rough prompt token count of a call: instruction and content characters / 4"""
+    config = llm_request.config
+    chars = len(str(config.system_instruction or "")) if config else 0
+    chars += sum(len(part.text or "") for content in llm_request.contents for part in content.parts or ())
+    return chars // 4
+
+
+def estimate_tokens(llm_request):
+    """Rough token count of a call: its prompt estimate plus the output cap"""
+    config = llm_request.config
+    return estimate_prompt_tokens(llm_request) + ((config.max_output_tokens if config else None) or 0)
+
+
+class RateLimitedLlm(BaseLlm):
+    """
+    Model whose calls pass through the process's shared RateLimiter first.
+
+    A call waits (queued by request priority) until the model's request and
+    token buckets allow it, then its token estimate is corrected to the
+    total the model reported. Behind a ModelRouter, time spent waiting counts
+    against the tier's latency budget, so a saturated tier fails over.
+    """
+
+    llm: BaseLlm
+
+    @property
+    def capabilities(self):
+        return self.llm.capabilities
+
+    @property
+    def api_client(self):
+        return self.llm.api_client
+
+    async def generate_content_async(self, llm_request, stream=False):
+        limiter = get_limiter()
+        estimated = estimate_tokens(llm_request)
+        await limiter.acquire(self.model, estimated)
+        actual = None
+        try:
+            async for response in self.llm.generate_content_async(llm_request, stream=stream):
+                if response.usage_metadata is not None and response.usage_metadata.total_token_count:
+                    actual = response.usage_metadata.total_token_count
+                yield response
+        finally:
+            await limiter.settle(self.model, estimated, actual)
@@ -0,0 +1,115 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Persistent cache of parsed agent outputs (disabled unless AGENT_CACHE_PATH is set)
+CACHE_PATH = os.getenv("AGENT_CACHE_PATH")
+CACHE_TTL = float(os.getenv("AGENT_CACHE_TTL", "21600"))
+CACHE_MAX_BYTES = int(os.getenv("AGENT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Check the size budget every N writes rather than on every write
+EVICT_EVERY = 50
+
+
+class ResponseCache:
+    """
+    SQLite-backed cache of parsed agent outputs keyed by model name and prompt.
+
+    The database runs in WAL mode so several agent processes can share one
+    file, and survives restarts so a freshly deployed process starts warm.
+    Entries expire after ``ttl`` seconds; once the stored values exceed
+    ``max_bytes`` the least recently used entries are evicted.
+    """
+
+    def __init__(self, path, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, model TEXT NOT NULL, value TEXT NOT NULL,"
+            " size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+
+    @staticmethod
+    def key(model, prompt):
+        """Stable hash of the model name and prompt"""
+        return hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def _get(self, model, prompt):
+        key = self.key(model, prompt)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM responses WHERE key = ? AND created > ?",
+                (key, now - self.ttl),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def _set(self, model, prompt, value):
+        data = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, value, size, created, accessed)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (self.key(model, prompt), model, data, len(data), now, now),
+            )
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 0:
+                self._evict(now)
+
+    def _evict(self, now):
+        """Drop expired entries, then least recently used ones until under max_bytes"""
+        self._conn.execute("DELETE FROM responses WHERE created <= ?", (now - self.ttl,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            doomed.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    async def get(self, model, prompt):
+        """Return the cached value for (model, prompt), or None"""
+        return await asyncio.to_thread(self._get, model, prompt)
+
+    async def set(self, model, prompt, value):
+        """Store a JSON-serializable value for (model, prompt)"""
+        await asyncio.to_thread(self._set, model, prompt, value)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def open_response_cache():
+    """Open the shared response cache if AGENT_CACHE_PATH is configured, else None"""
+    if not CACHE_PATH:
+        return None
+    return ResponseCache(CACHE_PATH)
@@ -0,0 +1,120 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one in-flight call.
+
+    The first caller for a key starts the work; callers arriving while it is
+    still running await the same future and receive the same result (or
+    exception). Once it completes the key is forgotten, so later calls start
+    fresh work. stream() does the same for async generators, replaying every
+    item produced so far to late joiners and then following along.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self._streams = {}
+        self.coalesced = 0
+
+    async def do(self, key, fn):
+        """
+        Run fn() once per key among concurrent callers.
+
+        Args:
+            key: Hashable key identifying identical requests
+            fn: Zero-argument callable returning an awaitable
+
+        Returns:
+            The result of the shared call
+        """
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            future = asyncio.ensure_future(fn())
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+        # Shield so one caller disconnecting does not cancel the others
+        return await asyncio.shield(future)
+
+    async def stream(self, key, fn):
+        """
+        Run the async generator fn() once per key among concurrent callers.
+
+        Args:
+            key: Hashable key identifying identical requests
+            fn: Zero-argument callable returning an async iterator
+
+        Yields:
+            Every item of the shared iterator, from the first one, then
+            raises its exception if it failed
+        """
+        feed = self._streams.get(key)
+        if feed is not None:
+            self.coalesced += 1
+        else:
+            feed = _Feed()
+            self._streams[key] = feed
+            # A task of its own, so one caller disconnecting does not stop the others
+            feed.task = asyncio.ensure_future(self._pump(key, feed, fn))
+        async for item in feed.follow():
+            yield item
+
+    async def _pump(self, key, feed, fn):
+        try:
+            async for item in fn():
+                feed.push(item)
+            feed.close()
+        except Exception as e:
+            feed.close(e)
+        finally:
+            if not feed.done:
+                # Cancelled, e.g. at shutdown: followers must not wait forever
+                feed.close(asyncio.CancelledError())
+            if self._streams.get(key) is feed:
+                del self._streams[key]
+
+    def _forget(self, key, future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+
+    def __len__(self):
+        return len(self._inflight) + len(self._streams)
+
+
+class _Feed:
+    """Items of one shared stream so far, for its followers to replay"""
+
+    def __init__(self):
+        self.items = []
+        self.done = False
+        self.error = None
+        self.task = None
+        self._changed = asyncio.Event()
+
+    def push(self, item):
+        self.items.append(item)
+        self._wake()
+
+    def close(self, error=None):
+        self.done = True
+        self.error = error
+        self._wake()
+
+    def _wake(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def follow(self):
+        index = 0
+        while True:
+            changed = self._changed
+            while index < len(self.items):
+                yield self.items[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
@@ -0,0 +1,533 @@
+import contextvars
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections import Counter, OrderedDict
+from common import rate_limit, tracing
+from common.json_stream import ItemStreamParser
+from common.metrics import MODEL_LATENCY, JSON_PARSE_FAILURES, MODEL_SERVED, MODEL_TOKENS, TRUNCATIONS
+from common.response_cache import open_response_cache
+from common.singleflight import SingleFlight
+from common.usage import USAGE_KEY, add_call, new_usage
+
+# Upper bounds on per-request sessions kept in the InMemorySessionService.
+# Sessions are deleted after each response; these catch any that leak.
+MAX_SESSIONS = int(os.getenv("AGENT_MAX_SESSIONS", "1000"))
+SESSION_TTL = float(os.getenv("AGENT_SESSION_TTL", "600"))
+
+# Send one canned request to the model during startup warm-up
+WARMUP_CALL = os.getenv("AGENT_WARMUP_CALL", "false").lower() in ("1", "true", "yes")
+
+# Ceiling for the output token cap, which doubles whenever an answer is cut off
+MAX_OUTPUT_TOKENS_LIMIT = int(os.getenv("AGENT_MAX_OUTPUT_TOKENS_LIMIT", "4096"))
+
+# Output token cap for the model call running in the current task
+_output_cap = contextvars.ContextVar("output_cap", default=None)
+
+
+class Specialist:
+    """
+    Runs a specialist ADK agent for the A2A server: one session per request,
+    coalescing of identical prompts, an optional persistent response cache
+    and parsing of the model's JSON answer.
+
+    Sessions are deleted once the final response arrives, and the number and
+    age of retained sessions is capped so long-running agents keep flat memory.
+
+    google.adk is only imported when the agent is first used (normally by the
+    startup warm-up), so the server can bind its port without waiting for it.
+
+    Answers cut off by the output token cap are detected (MAX_TOKENS finish
+    reason or unbalanced JSON) and retried once with a doubled cap, which is
+    kept for later requests.
+
+    The agent's static instruction is fingerprinted: the fingerprint is part
+    of the response cache key, so editing the instruction invalidates cached
+    answers, and prompt tokens the model served from its prompt cache are
+    counted separately from the rest.
+
+    Calls are labelled with the model tier that actually answered them, which
+    differs from the agent's model when a ModelRouter failed over. Tiers the
+    router gave up on mid-call are counted with their estimated prompt tokens.
+
+    Streamed requests are coalesced too: later callers replay the options
+    streamed so far and follow the same model call. Only requests of the
+    same rate limiter priority are coalesced.
+
+    Every result carries the tokens and cost spent producing it under
+    USAGE_KEY. Callers served from the response cache or coalesced onto
+    another caller's model call are charged nothing, so summing the usage
+    of all results counts each model call once.
+    """
+
+    def __init__(self, name, agent, result_key):
+        """
+        Args:
+            name: Short agent name, used for the app, user and session ids
+            agent: The ADK Agent to run, or a function building it on first use
+            result_key: JSON key holding the list of options (e.g. "flights")
+        """
+        self.name = name
+        self._build_agent = agent if callable(agent) else None
+        self._agent = None if callable(agent) else agent
+        self.result_key = result_key
+        self.app_name = f"{name}_app"
+        self.user_id = f"user_{name}"
+
+        # Session management (session_id -> creation time, oldest first)
+        self._session_service = None
+        self._sessions = OrderedDict()
+        self._runner = None
+
+        # Adaptive output token cap, starting from the agent's configured one
+        self.output_cap = None
+        self.truncations = 0
+        self._fingerprint = None
+
+        # Prompt tokens sent, and how many of them the model read from its cache
+        self.tokens = Counter()
+        # Model calls per serving model tier
+        self.served = Counter()
+        if self._agent is not None:
+            self._install_output_cap()
+
+        # Concurrent identical prompts share one model call
+        self.inflight = SingleFlight()
+        self.cache = open_response_cache()
+
+    @property
+    def agent(self):
+        if self._agent is None:
+            self._agent = self._build_agent()
+            self._install_output_cap()
+        return self._agent
+
+    @property
+    def session_service(self):
+        if self._session_service is None:
+            from google.adk.sessions import InMemorySessionService
+            self._session_service = InMemorySessionService()
+        return self._session_service
+
+    @property
+    def runner(self):
+        if self._runner is None:
+            from google.adk.runners import Runner
+            self._runner = Runner(
+                agent=self.agent,
+                app_name=self.app_name,
+                session_service=self.session_service
+            )
+        return self._runner
+
+    @property
+    def model_name(self):
+        return self.agent.model.model
+
+    @property
+    def instruction_fingerprint(self):
+        """Short hash of the agent's instructions, the prefix shared by every call"""
+        if self._fingerprint is None:
+            text = _text(self.agent.static_instruction) + "\0" + _text(self.agent.instruction)
+            self._fingerprint = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+        return self._fingerprint
+
+    @property
+    def cache_namespace(self):
+        """Response cache namespace: the model plus the instructions it answered under"""
+        return f"{self.model_name}#{self.instruction_fingerprint}"
+
+    @property
+    def item_keys(self):
+        """Result keys whose lists hold the options streamed by stream()"""
+        return (self.result_key,)
+
+    async def execute(self, prompt):
+        """
+        Run the agent on a prompt.
+
+        Args:
+            prompt: The user prompt built from the travel request
+
+        Returns:
+            {result_key: [options]} if the model answered with valid JSON,
+            otherwise {result_key: raw response text}, plus this call's
+            token usage and cost under USAGE_KEY
+        """
+        usage = new_usage(self.agent.name)
+        # Only the caller whose function runs is charged for the model call
+        result = await self.inflight.do(_flight_key(prompt), lambda: self._generate(prompt, usage))
+        return {**result, USAGE_KEY: usage}
+
+    async def stream(self, prompt):
+        """
+        Run the agent on a prompt, streaming options as the model writes them.
+
+        Args:
+            prompt: The user prompt built from the travel request
+
+        Yields:
+            {"key": result key, "item": option} as soon as each option's JSON
+            object is complete, then {"done": True, "result": ...} holding
+            what execute() would have returned. If the answer was cut off,
+            {"reset": True} voids the options streamed so far and the
+            options of the final answer follow
+        """
+        usage = new_usage(self.agent.name)
+        # Concurrent identical prompts share one streamed model call, and
+        # only the caller whose generator runs is charged for it
+        async for event in self.inflight.stream(_flight_key(prompt), lambda: self._stream(prompt, usage)):
+            if event.get("done"):
+                event = {"done": True, "result": {**event["result"], USAGE_KEY: usage}}
+            yield event
+
+    async def _stream(self, prompt, usage):
+        emitted = Counter()
+        if self.cache is not None:
+            result = await self.cache.get(self.cache_namespace, prompt)
+            if result is not None:
+                for event in self._remaining_items(result, emitted):
+                    yield event
+                yield {"done": True, "result": result}
+                return
+
+        parser = ItemStreamParser(self.item_keys)
+        async for event in self._model_events(prompt, stream=True, usage=usage):
+            if "chunk" in event:
+                for key, item in parser.feed(event["chunk"]):
+                    emitted[key] += 1
+                    yield {"key": key, "item": item}
+            else:
+                final = event
+
+        result = await self._complete(prompt, final["text"], final["truncated"], usage)
+        if final["truncated"] and sum(emitted.values()):
+            # The answer was rerun, and the rerun need not repeat the options
+            # already streamed: have the client drop them and send them all
+            emitted.clear()
+            yield {"reset": True}
+        # Options the parser could not emit early, e.g. from a retried answer
+        for event in self._remaining_items(result, emitted):
+            yield event
+        yield {"done": True, "result": result}
+
+    def _remaining_items(self, result, emitted):
+        """Item events for the options in a parsed result not yet streamed"""
+        for key in self.item_keys:
+            options = result.get(key)
+            if isinstance(options, list):
+                for item in options[emitted[key]:]:
+                    emitted[key] += 1
+                    yield {"key": key, "item": item}
+
+    async def _generate(self, prompt, usage=None):
+        if self.cache is not None:
+            cached = await self.cache.get(self.cache_namespace, prompt)
+            if cached is not None:
+                return cached
+
+        response_text, truncated = await self._run_model(prompt, usage=usage)
+        return await self._complete(prompt, response_text, truncated, usage)
+
+    async def _complete(self, prompt, response_text, truncated, usage=None):
+        """Retry a cut-off answer with a higher cap, then parse and cache it"""
+        if truncated:
+            cap = self._raise_output_cap()
+            if cap is not None:
+                # The JSON is unusable as it stands; rerun once with room to finish
+                print(f"✂️  {self.agent.name} answer was cut off, retrying with {cap} output tokens")
+                response_text, truncated = await self._run_model(prompt, cap, usage)
+        result = self._parse(response_text)
+        if self.cache is not None and self._cacheable(result):
+            await self.cache.set(self.cache_namespace, prompt, result)
+        return result
+
+    async def _run_model(self, prompt, max_output_tokens=None, usage=None):
+        """
+        Run the agent once in a fresh session.
+
+        Args:
+            prompt: The user prompt
+            max_output_tokens: Output token cap for this call (default: the
+                current adaptive cap)
+            usage: Usage record (see common/usage.py) to add the call's tokens to
+
+        Returns:
+            (final response text, whether the answer was cut off)
+        """
+        async for event in self._model_events(prompt, max_output_tokens, usage=usage):
+            final = event
+        return final["text"], final["truncated"]
+
+    async def _model_events(self, prompt, max_output_tokens=None, stream=False, usage=None):
+        """
+        Run the agent once in a fresh session, optionally streaming its output.
+
+        Args:
+            prompt: The user prompt
+            max_output_tokens: Output token cap for this call (default: the
+                current adaptive cap)
+            stream: Ask the model for partial output while it generates
+            usage: Usage record (see common/usage.py) to add the call's tokens to
+
+        Yields:
+            {"chunk": text} per piece of partial output (stream=True only),
+            then {"text": final response text, "truncated": bool}
+        """
+        from google.adk.agents.run_config import RunConfig, StreamingMode
+        from google.genai import types
+        message = types.Content(role="user", parts=[types.Part(text=prompt)])
+        run_config = RunConfig(streaming_mode=StreamingMode.SSE if stream else StreamingMode.NONE)
+        cap_token = _output_cap.set(max_output_tokens or self.output_cap)
+
+        # Create a new session for each request
+        session_id = await self._open_session()
+        try:
+            # Drain the run instead of returning mid-iteration so the runner can
+            # close its own tracing context cleanly
+            response_text = None
+            finish_reason = None
+            model = self.model_name
+            start = time.monotonic()
+            with tracing.span(f"{self.agent.name} model_call", model=self.model_name) as span:
+                async for event in self.runner.run_async(user_id=self.user_id, session_id=session_id,
+                                                         new_message=message, run_config=run_config):
+                    if event.partial:
+                        if event.content and event.content.parts and event.content.parts[0].text:
+                            yield {"chunk": event.content.parts[0].text}
+                        continue
+                    # Set by a ModelRouter to the tier that answered, and the
+                    # tiers it abandoned on the way (billed all the same)
+                    metadata = event.custom_metadata or {}
+                    model = metadata.get("model", model)
+                    for attempt in metadata.get("abandoned", ()):
+                        abandoned = types.GenerateContentResponseUsageMetadata(**attempt["usage"])
+                        self._record_usage(abandoned, attempt["model"])
+                        if usage is not None:
+                            add_call(usage, attempt["model"], abandoned)
+                    if event.usage_metadata is not None:
+                        self._record_usage(event.usage_metadata, model)
+                        if usage is not None:
+                            add_call(usage, model, event.usage_metadata)
+                    if event.is_final_response():
+                        response_text = event.content.parts[0].text
+                        finish_reason = event.finish_reason
+                span.attributes["served_by"] = model
+            MODEL_LATENCY.observe(time.monotonic() - start, agent=self.agent.name, model=model)
+            MODEL_SERVED.inc(agent=self.agent.name, model=model)
+            self.served[model] += 1
+        finally:
+            _output_cap.reset(cap_token)
+            await self._close_session(session_id)
+
+        truncated = finish_reason == types.FinishReason.MAX_TOKENS or _unbalanced(response_text)
+        if truncated:
+            self.truncations += 1
+            TRUNCATIONS.inc(agent=self.agent.name)
+        yield {"text": response_text, "truncated": truncated}
+
+    def _install_output_cap(self):
+        """Start from the agent's configured cap and apply it per call via a callback"""
+        config = self._agent.generate_content_config
+        self.output_cap = config.max_output_tokens if config else None
+        if self._agent.before_model_callback is None:
+            self._agent.before_model_callback = self._apply_output_cap
+        else:
+            existing = self._agent.before_model_callback
+            existing = existing if isinstance(existing, list) else [existing]
+            self._agent.before_model_callback = [self._apply_output_cap, *existing]
+
+    def _apply_output_cap(self, callback_context, llm_request):
+        """before_model_callback: apply the output token cap chosen for this call"""
+        cap = _output_cap.get()
+        if cap:
+            llm_request.config.max_output_tokens = cap
+        return None
+
+    def _raise_output_cap(self):
+        """
+        Double the adaptive output token cap, up to MAX_OUTPUT_TOKENS_LIMIT.
+
+        Returns:
+            The new cap, or None if it cannot be raised any further
+        """
+        if self.output_cap is None or self.output_cap >= MAX_OUTPUT_TOKENS_LIMIT:
+            return None
+        self.output_cap = min(MAX_OUTPUT_TOKENS_LIMIT, self.output_cap * 2)
+        return self.output_cap
+
+    async def warmup(self, call_model=WARMUP_CALL):
+        """
+        Pay first-request initialization costs up front: build the model
+        client in this event loop, exercise the session service and
+        optionally send one canned request to open the model connection.
+
+        Args:
+            call_model: Also send a canned warm-up request to the model
+        """
+        start = time.monotonic()
+        # Importing google.adk and building the runner is most of the cold start
+        self.runner
+        # The ADK model builds its API client lazily on first use, for every tier
+        for model in getattr(self.agent.model, "tiers", [self.agent.model]):
+            if hasattr(model, "api_client"):
+                model.api_client
+        session_id = await self._open_session()
+        await self._close_session(session_id)
+        if call_model:
+            try:
+                await self._run_model(f"Warm-up request. Respond with {{\"{self.result_key}\": []}}")
+            except Exception as e:
+                print(f"⚠️  {self.agent.name} warm-up call failed: {e}")
+        print(f"🔥 {self.agent.name} warmed up in {time.monotonic() - start:.2f}s "
+              f"(instruction {self.instruction_fingerprint})")
+
+    async def _open_session(self):
+        """Create a fresh session, first evicting sessions over the cap or TTL"""
+        await self._sweep_sessions()
+        session_id = f"session_{self.name}_{uuid.uuid4().hex[:8]}"
+        try:
+            await self.session_service.create_session(
+                app_name=self.app_name,
+                user_id=self.user_id,
+                session_id=session_id
+            )
+        except:
+            # Session might already exist, continue
+            pass
+        self._sessions[session_id] = time.monotonic()
+        return session_id
+
+    async def _close_session(self, session_id):
+        """Delete a finished session from the session service"""
+        self._sessions.pop(session_id, None)
+        try:
+            await self.session_service.delete_session(
+                app_name=self.app_name,
+                user_id=self.user_id,
+                session_id=session_id
+            )
+        except Exception as e:
+            print(f"⚠️  Could not delete session {session_id}: {e}")
+
+    async def _sweep_sessions(self):
+        """Delete the oldest retained sessions beyond MAX_SESSIONS or SESSION_TTL"""
+        now = time.monotonic()
+        while self._sessions:
+            session_id, created = next(iter(self._sessions.items()))
+            if len(self._sessions) < MAX_SESSIONS and now - created < SESSION_TTL:
+                break
+            await self._close_session(session_id)
+
+    @property
+    def live_sessions(self):
+        """Number of sessions currently held by the session service"""
+        return len(self._sessions)
+
+    def _record_usage(self, usage, model):
+        """Count the tokens reported in a model response's usage metadata"""
+        for kind, count in (
+            ("prompt", usage.prompt_token_count),
+            ("cached", usage.cached_content_token_count),
+            ("output", usage.candidates_token_count),
+            ("thoughts", usage.thoughts_token_count),
+            ("total", usage.total_token_count),
+        ):
+            if count:
+                MODEL_TOKENS.inc(count, agent=self.agent.name, model=model, type=kind)
+                if kind in ("prompt", "cached"):
+                    self.tokens[kind] += count
+
+    def _load(self, response_text):
+        """
+        Decode the model's answer, validating it against the agent's output
+        schema when it has one.
+
+        Returns:
+            The decoded JSON value, or None if it is not valid
+        """
+        schema = getattr(self.agent, "output_schema", None)
+        try:
+            if schema is not None:
+                return schema.model_validate_json(response_text).model_dump()
+            return json.loads(response_text)
+        except ValueError:
+            # json.JSONDecodeError and pydantic.ValidationError
+            return None
+
+    def _parse(self, response_text):
+        if response_text is None:
+            return {self.result_key: "No response from model."}
+        parsed = self._load(response_text)
+        if isinstance(parsed, dict) and isinstance(parsed.get(self.result_key), list):
+            return {self.result_key: parsed[self.result_key]}
+        # If parsing fails, return as text
+        JSON_PARSE_FAILURES.inc(agent=self.agent.name)
+        return {self.result_key: response_text}
+
+    def _cacheable(self, result):
+        """Only well-formed answers are worth caching"""
+        return isinstance(result[self.result_key], list)
+
+    def stats(self):
+        """Coalescing, session, truncation, token, model tier and response cache counters for the /health endpoint"""
+        stats = {
+            "coalesced": self.inflight.coalesced,
+            "in_flight": len(self.inflight),
+            "live_sessions": self.live_sessions,
+            "truncations": self.truncations,
+            "prompt_tokens": self.tokens["prompt"],
+            "cached_prompt_tokens": self.tokens["cached"],
+        }
+        if self._agent is not None:
+            stats["instruction"] = self.instruction_fingerprint
+        if self.served:
+            stats["served_by"] = dict(self.served)
+        if self.output_cap is not None:
+            stats["output_cap"] = self.output_cap
+        if self.cache is not None:
+            stats["response_cache"] = self.cache.stats()
+        return stats
+
+
+def _flight_key(prompt):
+    """
+    Coalescing key of a prompt: callers only share model calls queued at
+    their own rate limiter priority, so an interactive request never waits
+    behind a background one
+    """
+    return prompt, rate_limit.current_priority()
+
+
+def _text(instruction):
+    """Plain text of an agent instruction: a string, a Content or unset"""
+    if not instruction or callable(instruction):
+        return ""
+    if isinstance(instruction, str):
+        return instruction
+    return "".join(part.text or "" for part in getattr(instruction, "parts", None) or ())
+
+
+def _unbalanced(text):
+    """True if text opens a JSON object or array that it never closes (a cut-off answer)"""
+    if not text:
+        return False
+    depth = 0
+    in_string = escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+    return depth > 0 or in_string
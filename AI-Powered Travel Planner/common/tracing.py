@@ -0,0 +1,216 @@
+import atexit
+import contextvars
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+# Completed spans are appended here as JSON lines (disabled unless set)
+TRACE_FILE = os.getenv("TRACE_FILE")
+
+# Header carrying the trace context between UI, host and specialists (W3C format)
+TRACEPARENT = "traceparent"
+# Request header asking an agent to return its timing breakdown in the response
+TIMING_HEADER = "x-trace-timing"
+# Response key holding the timing breakdown
+TIMING_KEY = "_timing"
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_timings = contextvars.ContextVar("timings", default=None)
+
+# Finished spans (JSON lines) waiting for the writer thread, which keeps file
+# I/O off the event loop; flush() requests are queued as threading.Events
+_pending = queue.SimpleQueue()
+_writer = None
+_writer_lock = threading.Lock()
+
+
+class Span:
+    """One timed operation within a trace"""
+
+    def __init__(self, name, trace_id=None, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id or secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = attributes or {}
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+
+    def end(self):
+        self.duration = time.perf_counter() - self._start
+
+    def elapsed_ms(self):
+        return round((time.perf_counter() - self._start) * 1000, 1)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_time,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "attributes": self.attributes,
+        }
+
+
+def current_span():
+    return _current_span.get()
+
+
+def new_span(name, parent=None, **attributes):
+    """
+    Create a span without making it current.
+
+    Args:
+        name: Span name, e.g. "host_agent /run"
+        parent: (trace_id, span_id) from extract(); defaults to the current span
+        **attributes: Extra fields recorded with the span
+
+    Returns:
+        The new Span
+    """
+    current = current_span()
+    if parent is None and current is not None:
+        parent = (current.trace_id, current.span_id)
+    trace_id, parent_id = parent if parent is not None else (None, None)
+    return Span(name, trace_id, parent_id, attributes)
+
+
+@contextmanager
+def activate(span, timings=None):
+    """
+    Make a span current for a block, optionally collecting a timing breakdown.
+
+    Args:
+        span: Span started with new_span()
+        timings: List that spans finished inside the block are appended to,
+            or None to not collect a breakdown
+    """
+    span_token = _current_span.set(span)
+    timings_token = _timings.set(timings)
+    try:
+        yield span
+    finally:
+        _timings.reset(timings_token)
+        _current_span.reset(span_token)
+
+
+def end_span(span):
+    """Finish a span, record it in the active timing breakdown and export it"""
+    span.end()
+    timings = _timings.get()
+    if timings is not None:
+        timings.append({"span": span.name, "ms": round(span.duration * 1000, 1)})
+    _export(span)
+
+
+@contextmanager
+def span(name, parent=None, **attributes):
+    """Create a span, make it current for the block and finish it afterwards"""
+    current = new_span(name, parent, **attributes)
+    span_token = _current_span.set(current)
+    try:
+        yield current
+    finally:
+        _current_span.reset(span_token)
+        end_span(current)
+
+
+def _export(span):
+    if not TRACE_FILE:
+        return
+    _pending.put(json.dumps(span.to_dict()))
+    if _writer is None:
+        _start_writer()
+
+
+def _start_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_write_spans, name="trace-writer", daemon=True)
+            _writer.start()
+            atexit.register(flush)
+
+
+def _write_spans():
+    """Append queued spans to TRACE_FILE, one write per batch, for the life of the process"""
+    sink = None
+    try:
+        directory = os.path.dirname(TRACE_FILE)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        sink = open(TRACE_FILE, "a")
+    except OSError as e:
+        print(f"⚠️  Could not open TRACE_FILE, spans are dropped: {e}")
+    while True:
+        batch = [_pending.get()]
+        while True:
+            try:
+                batch.append(_pending.get_nowait())
+            except queue.Empty:
+                break
+        lines = [item for item in batch if isinstance(item, str)]
+        if sink is not None and lines:
+            try:
+                sink.write("".join(line + "\n" for line in lines))
+                sink.flush()
+            except OSError as e:
+                print(f"⚠️  Could not write trace spans: {e}")
+        for item in batch:
+            if isinstance(item, threading.Event):
+                item.set()
+
+
+def flush(timeout=5.0):
+    """Wait until the spans exported so far are written to TRACE_FILE"""
+    if _writer is None:
+        return
+    written = threading.Event()
+    _pending.put(written)
+    written.wait(timeout)
+
+
+def inject(headers=None):
+    """
+    Add the current trace context (and timing request, if active) to headers.
+
+    Returns:
+        The headers dict
+    """
+    headers = dict(headers or {})
+    current = current_span()
+    if current is not None:
+        headers[TRACEPARENT] = f"00-{current.trace_id}-{current.span_id}-01"
+    if _timings.get() is not None:
+        headers[TIMING_HEADER] = "1"
+    return headers
+
+
+def extract(headers):
+    """
+    Read a trace context from incoming headers.
+
+    Returns:
+        (trace_id, span_id) or None if there is no valid traceparent header
+    """
+    value = headers.get(TRACEPARENT)
+    if not value:
+        return None
+    parts = value.split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2]
+
+
+def add_timings(entries):
+    """Merge a downstream agent's timing breakdown into the current one"""
+    timings = _timings.get()
+    if timings is not None and entries:
+        timings.extend(entries)
@@ -0,0 +1,188 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+from datetime import date
+
+from common.config import DATA_DIR
+
+# Response key carrying the tokens and cost an agent spent on a request
+USAGE_KEY = "_usage"
+
+# SQLite file with per-day, per-agent, per-model token and cost totals
+# (set AGENT_USAGE_PATH= to disable)
+USAGE_PATH = os.getenv("AGENT_USAGE_PATH", os.path.join(DATA_DIR, "daily_usage.sqlite"))
+
+# USD per million tokens: (input, cached input, output including thinking).
+# Paid-tier list prices for prompts up to 200k tokens; override or extend
+# with AGENT_MODEL_PRICES='{"model": [input, cached, output]}'
+PRICES = {
+    "gemini-2.5-pro": (1.25, 0.125, 10.00),
+    "gemini-2.5-flash": (0.30, 0.03, 2.50),
+    "gemini-2.5-flash-lite": (0.10, 0.01, 0.40),
+    "gemini-2.0-flash": (0.10, 0.025, 0.40),
+    **{model: tuple(price) for model, price in json.loads(os.getenv("AGENT_MODEL_PRICES", "{}")).items()},
+}
+
+TOKEN_FIELDS = ("prompt_tokens", "cached_tokens", "output_tokens", "total_tokens")
+
+
+def price(model):
+    """
+    Price of a model, matched on the longest known prefix so versioned names
+    (gemini-2.5-flash-preview-09-2025) and fake models (fake-gemini-2.5-flash)
+    resolve to their base model.
+
+    Returns:
+        (input, cached input, output) USD per million tokens, or None if unknown
+    """
+    name = model.removeprefix("fake-") if model else ""
+    matches = [known for known in PRICES if name.startswith(known)]
+    return PRICES[max(matches, key=len)] if matches else None
+
+
+def new_usage(agent):
+    """Empty usage record for one agent's part of a request"""
+    return {"agent": agent, "model": None, "calls": 0, **{field: 0 for field in TOKEN_FIELDS}, "cost_usd": 0.0}
+
+
+def add_call(usage, model, metadata):
+    """
+    Add one model call's usage metadata to a usage record.
+
+    Args:
+        usage: Record from new_usage(), updated in place
+        model: Model tier that served the call
+        metadata: The response's GenerateContentResponseUsageMetadata
+    """
+    prompt = metadata.prompt_token_count or 0
+    cached = metadata.cached_content_token_count or 0
+    # Thinking tokens are billed as output
+    output = (metadata.candidates_token_count or 0) + (metadata.thoughts_token_count or 0)
+    usage["model"] = model
+    usage["calls"] += 1
+    usage["prompt_tokens"] += prompt
+    usage["cached_tokens"] += cached
+    usage["output_tokens"] += output
+    usage["total_tokens"] += metadata.total_token_count or prompt + output
+    rates = price(model)
+    if rates is not None:
+        input_rate, cached_rate, output_rate = rates
+        usage["cost_usd"] += ((prompt - cached) * input_rate + cached * cached_rate + output * output_rate) / 1e6
+
+
+def summarize(usages):
+    """
+    Combine agents' usage records for one request.
+
+    Returns:
+        {"total": summed tokens and cost, "agents": {agent: record}}
+    """
+    total = {"calls": 0, **{field: 0 for field in TOKEN_FIELDS}, "cost_usd": 0.0}
+    agents = {}
+    for usage in usages:
+        agent = agents.setdefault(usage["agent"], new_usage(usage["agent"]))
+        agent["model"] = usage.get("model") or agent["model"]
+        for field in ("calls", *TOKEN_FIELDS, "cost_usd"):
+            agent[field] += usage.get(field, 0)
+            total[field] += usage.get(field, 0)
+    for record in (total, *agents.values()):
+        record["cost_usd"] = round(record["cost_usd"], 6)
+    return {"total": total, "agents": agents}
+
+
+class UsageLedger:
+    """
+    Daily token and cost rollups per agent and model in a SQLite file.
+
+    Rows are incremented with an upsert, so several host processes can share
+    the file. Query it directly for reports, e.g.
+    SELECT day, SUM(cost_usd) FROM daily_usage GROUP BY day.
+
+    Opening the ledger and add() touch the database; today() answers from
+    the totals read back after the last add(), without blocking.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS daily_usage ("
+            " day TEXT NOT NULL, agent TEXT NOT NULL, model TEXT NOT NULL,"
+            " requests INTEGER NOT NULL, calls INTEGER NOT NULL,"
+            " prompt_tokens INTEGER NOT NULL, cached_tokens INTEGER NOT NULL,"
+            " output_tokens INTEGER NOT NULL, total_tokens INTEGER NOT NULL,"
+            " cost_usd REAL NOT NULL, PRIMARY KEY (day, agent, model))"
+        )
+        self._today = self._day(date.today().isoformat())
+
+    def _add(self, day, agents):
+        rows = [
+            (day, agent, usage["model"] or "", usage["calls"],
+             *(usage[field] for field in TOKEN_FIELDS), usage["cost_usd"])
+            for agent, usage in agents.items() if usage["calls"]
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO daily_usage (day, agent, model, requests, calls, prompt_tokens, cached_tokens,"
+                " output_tokens, total_tokens, cost_usd) VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (day, agent, model) DO UPDATE SET requests = requests + 1,"
+                " calls = calls + excluded.calls, prompt_tokens = prompt_tokens + excluded.prompt_tokens,"
+                " cached_tokens = cached_tokens + excluded.cached_tokens,"
+                " output_tokens = output_tokens + excluded.output_tokens,"
+                " total_tokens = total_tokens + excluded.total_tokens, cost_usd = cost_usd + excluded.cost_usd",
+                rows,
+            )
+        # Includes what other processes sharing the file added meanwhile
+        self._today = self._day(day)
+
+    def _day(self, day):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT SUM(requests), SUM(calls), SUM(total_tokens), SUM(cost_usd) FROM daily_usage WHERE day = ?",
+                (day,),
+            ).fetchone()
+        requests, calls, tokens, cost = (value or 0 for value in rows)
+        return {"day": day, "requests": requests, "calls": calls, "total_tokens": tokens, "cost_usd": round(cost, 6)}
+
+    async def add(self, summary):
+        """Add one request's summarize() result to today's rollup"""
+        await asyncio.to_thread(self._add, date.today().isoformat(), summary["agents"])
+
+    def today(self):
+        """Totals for today across every agent and model, as of the last add()"""
+        day = date.today().isoformat()
+        if self._today["day"] != day:
+            return {"day": day, "requests": 0, "calls": 0, "total_tokens": 0, "cost_usd": 0.0}
+        return self._today
+
+
+_ledger = None
+_ledger_opened = False
+_ledger_lock = threading.Lock()
+
+
+def get_usage_ledger():
+    """
+    Process-wide daily usage rollup, opened on first use. Opening touches
+    the disk, so call it through asyncio.to_thread.
+
+    Returns:
+        The UsageLedger, or None if AGENT_USAGE_PATH is empty or the file
+        cannot be opened
+    """
+    global _ledger, _ledger_opened
+    with _ledger_lock:
+        if not _ledger_opened:
+            _ledger_opened = True
+            try:
+                _ledger = UsageLedger(USAGE_PATH) if USAGE_PATH else None
+            except (sqlite3.Error, OSError) as e:
+                print(f"⚠️  Could not open the usage rollup {USAGE_PATH}: {e}")
+        return _ledger
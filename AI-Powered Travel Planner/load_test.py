@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Load generator for the host agent's /run endpoint.
+
+Sends travel requests at a fixed arrival rate (open loop, so slow responses
+do not slow the sender down) and reports throughput and latency percentiles.
+Pair it with AGENT_MODEL_BACKEND=fake to measure the host -> specialist
+pipeline offline, without Gemini calls or an API key.
+
+Usage:
+    # Against running agents (python main.py --no-ui)
+    python load_test.py --rps 20 --duration 30
+
+    # Entirely in this process: host plus in-process specialists, no servers
+    AGENT_MODEL_BACKEND=fake A2A_TRANSPORT=inprocess python load_test.py --inprocess
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+from contextlib import AsyncExitStack
+from datetime import date, timedelta
+
+import httpx
+
+ORIGINS = ["New York", "London", "San Francisco", "Chicago", "Toronto"]
+DESTINATIONS = ["Paris", "Tokyo", "Rome", "Barcelona", "Lisbon", "Sydney", "Bangkok", "Berlin"]
+
+
+def random_request(unique):
+    """A travel request; unique=True varies the budget so the plan cache never hits"""
+    start = date.today() + timedelta(days=random.randint(7, 90))
+    budget = random.randint(1000, 5000) if unique else random.choice([1500, 2000, 3000])
+    return {
+        "origin": random.choice(ORIGINS),
+        "destination": random.choice(DESTINATIONS),
+        "start_date": str(start),
+        "end_date": str(start + timedelta(days=random.randint(3, 10))),
+        "budget": budget,
+    }
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, round(p / 100 * len(values) + 0.5) - 1))
+    return values[index]
+
+
+async def run_load(client, url, rps, duration, max_in_flight, unique):
+    """
+    Drive url at rps requests per second for duration seconds.
+
+    Returns:
+        (list of (latency seconds, outcome) per request, wall time in seconds)
+    """
+    results = []
+    in_flight = asyncio.Semaphore(max_in_flight)
+
+    async def one_request():
+        start = time.perf_counter()
+        try:
+            response = await client.post(url, json=random_request(unique))
+            outcome = str(response.status_code)
+            if response.status_code == 200 and response.json().get("errors"):
+                outcome = "200 (partial)"
+        except (httpx.HTTPError, ValueError) as e:
+            # ValueError: a 200 whose body is not JSON
+            outcome = type(e).__name__
+        finally:
+            in_flight.release()
+        results.append((time.perf_counter() - start, outcome))
+
+    total = int(rps * duration)
+    tasks = []
+    begin = time.perf_counter()
+    for i in range(total):
+        delay = begin + i / rps - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        # Past max_in_flight the system is saturated; the sender falls behind
+        await in_flight.acquire()
+        tasks.append(asyncio.ensure_future(one_request()))
+    await asyncio.gather(*tasks)
+    return results, time.perf_counter() - begin
+
+
+def report(results, elapsed):
+    outcomes = Counter(outcome for _, outcome in results)
+    ok = sorted(latency for latency, outcome in results if outcome.startswith("200"))
+    print(f"\nRequests:   {len(results)} in {elapsed:.1f}s")
+    print(f"Throughput: {len(ok) / elapsed:.1f} successful req/s")
+    print(f"Outcomes:   {', '.join(f'{k}: {v}' for k, v in sorted(outcomes.items()))}")
+    if ok:
+        print(f"Latency:    p50 {percentile(ok, 50) * 1000:.0f} ms | "
+              f"p95 {percentile(ok, 95) * 1000:.0f} ms | "
+              f"p99 {percentile(ok, 99) * 1000:.0f} ms | "
+              f"max {ok[-1] * 1000:.0f} ms")
+
+
+async def main_async(args):
+    async with AsyncExitStack() as stack:
+        if args.inprocess:
+            # Serve the host app in this process, running its lifespan (client
+            # pool, warm-up) the same way uvicorn would
+            from agents.host_agent.__main__ import app
+            await stack.enter_async_context(app.router.lifespan_context(app))
+            transport = httpx.ASGITransport(app=app)
+            url = "http://host_agent/run"
+            while not app.state.ready:
+                await asyncio.sleep(0.1)
+        else:
+            transport = None
+            url = args.url
+
+        client = await stack.enter_async_context(
+            httpx.AsyncClient(transport=transport, timeout=args.timeout,
+                              limits=httpx.Limits(max_connections=args.max_in_flight))
+        )
+        print(f"🚀 {args.rps} req/s for {args.duration}s against {url}")
+        results, elapsed = await run_load(client, url, args.rps, args.duration,
+                                          args.max_in_flight, args.unique)
+    report(results, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the travel planner host agent")
+    parser.add_argument("--url", default="http://localhost:8000/run", help="host agent /run URL")
+    parser.add_argument("--rps", type=float, default=10, help="target requests per second")
+    parser.add_argument("--duration", type=float, default=20, help="seconds to send requests for")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="cap on concurrent requests")
+    parser.add_argument("--timeout", type=float, default=120, help="per-request timeout in seconds")
+    parser.add_argument("--unique", action="store_true", help="make every request miss the plan cache")
+    parser.add_argument("--inprocess", action="store_true",
+                        help="serve the host app inside this process instead of calling --url")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
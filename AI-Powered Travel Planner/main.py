@@ -1,5 +1,241 @@
+#!/usr/bin/env python3
+"""
+Supervisor for the ADK Travel Planner.
+
+Starts the specialist and host agents, polls their /health endpoints and
+starts the Streamlit UI as soon as every agent is ready. Children that crash
+are restarted with exponential backoff. Ctrl+C stops everything.
+
+Usage:
+    python main.py [--workers N] [--no-ui]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import importlib.util
+import os
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+import httpx
+from dotenv import load_dotenv
+
+# Before importing common modules: they read their settings (e.g.
+# AGENT_UDS_DIR) at import time, and the children inherit this environment
+load_dotenv()
+
+from common.a2a_client import agent_socket_path  # noqa: E402
+
+# (name, uvicorn app, port)
+AGENTS = [
+    ("flight_agent", "agents.flight_agent.__main__:app", 8001),
+    ("stay_agent", "agents.stay_agent.__main__:app", 8002),
+    ("activities_agent", "agents.activities_agent.__main__:app", 8003),
+    ("host_agent", "agents.host_agent.__main__:app", 8000),
+]
+
+LOG_DIR = "logs"
+READY_TIMEOUT = float(os.getenv("SUPERVISOR_READY_TIMEOUT", "60"))
+POLL_INTERVAL = 0.1
+BACKOFF_INITIAL = 1.0
+BACKOFF_MAX = 30.0
+# A child that stays up this long is considered healthy again
+STABLE_AFTER = 60.0
+
+
+def _port_in_use(port):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        return sock.connect_ex(("127.0.0.1", port)) == 0
+
+
+def _socket_in_use(path):
+    """True if a server still accepts connections on the Unix socket (not just a stale file)"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        return sock.connect_ex(path) == 0
+
+
+def _uvicorn_command(app, port, workers, uds=None):
+    """uvicorn command line for one agent, using uvloop/httptools when installed"""
+    command = [sys.executable, "-m", "uvicorn", app]
+    if uds:
+        command += ["--uds", uds]
+    else:
+        command += ["--host", "0.0.0.0", "--port", str(port)]
+    if workers > 1:
+        command += ["--workers", str(workers)]
+    if importlib.util.find_spec("uvloop"):
+        command += ["--loop", "uvloop"]
+    if importlib.util.find_spec("httptools"):
+        command += ["--http", "httptools"]
+    return command
+
+
+class Child:
+    """A supervised subprocess, restarted with backoff when it exits unexpectedly"""
+
+    def __init__(self, name, command, health_url=None, uds=None):
+        self.name = name
+        self.command = command
+        self.health_url = health_url
+        self.uds = uds
+        self.process = None
+        self.restarts = 0
+        self._started_at = 0.0
+
+    def remove_socket(self):
+        """Delete the child's Unix socket file, which uvicorn --uds refuses to bind over"""
+        if self.uds:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self.uds)
+
+    async def start(self):
+        # A socket left by a crashed run (or the previous attempt) blocks the bind
+        self.remove_socket()
+        os.makedirs(LOG_DIR, exist_ok=True)
+        log = open(os.path.join(LOG_DIR, f"{self.name}.log"), "ab")
+        self.process = await asyncio.create_subprocess_exec(
+            *self.command, stdout=log, stderr=asyncio.subprocess.STDOUT
+        )
+        log.close()
+        self._started_at = time.monotonic()
+        print(f"▶️  Started {self.name} (PID {self.process.pid})")
+
+    async def wait_ready(self):
+        """Poll /health until it answers 200; returns False on timeout or exit"""
+        if self.health_url is None:
+            return True
+        transport = httpx.AsyncHTTPTransport(uds=self.uds) if self.uds else None
+        async with httpx.AsyncClient(transport=transport) as client:
+            deadline = time.monotonic() + READY_TIMEOUT
+            while time.monotonic() < deadline:
+                if self.process.returncode is not None:
+                    return False
+                try:
+                    response = await client.get(self.health_url, timeout=1.0)
+                    if response.status_code == 200:
+                        return True
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(POLL_INTERVAL)
+        return False
+
+    async def supervise(self, stopping):
+        """Restart the child whenever it exits, until the supervisor is stopping"""
+        while True:
+            code = await self.process.wait()
+            if stopping.is_set():
+                return
+            if time.monotonic() - self._started_at > STABLE_AFTER:
+                self.restarts = 0
+            delay = min(BACKOFF_MAX, BACKOFF_INITIAL * 2 ** self.restarts)
+            self.restarts += 1
+            print(f"❌ {self.name} exited with code {code}, restarting in {delay:.0f}s "
+                  f"(see {LOG_DIR}/{self.name}.log)")
+            try:
+                await asyncio.wait_for(stopping.wait(), timeout=delay)
+                return
+            except asyncio.TimeoutError:
+                pass
+            await self.start()
+
+    async def stop(self):
+        if self.process is not None and self.process.returncode is None:
+            self.process.terminate()
+            try:
+                await asyncio.wait_for(self.process.wait(), timeout=5.0)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+        self.remove_socket()
+
+
+async def supervise(workers=1, ui=True):
+    """
+    Start all agents, then the UI once they are healthy, and keep them running.
+
+    Args:
+        workers: uvicorn worker processes per agent
+        ui: Also start the Streamlit UI
+    """
+    # In-process mode runs the specialists inside the host
+    inprocess = os.getenv("A2A_TRANSPORT", "http").lower() == "inprocess"
+    agents = [agent for agent in AGENTS if not inprocess or agent[0] == "host_agent"]
+
+    # Specialists bind Unix sockets when AGENT_UDS_DIR is set; the host keeps
+    # its TCP port for the UI
+    children = []
+    for name, app, port in agents:
+        uds = agent_socket_path(name) if name != "host_agent" else None
+        health_url = "http://localhost/health" if uds else f"http://localhost:{port}/health"
+        children.append(Child(name, _uvicorn_command(app, port, workers, uds), health_url, uds))
+
+    busy = [child.uds if child.uds else port for (_, _, port), child in zip(agents, children)
+            if (_socket_in_use(child.uds) if child.uds else _port_in_use(port))]
+    if busy:
+        print(f"❌ Address(es) already in use: {', '.join(map(str, busy))}")
+        print("Stop the processes using them (e.g. a previous run) and try again.")
+        return 1
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stopping.set)
+        except NotImplementedError:
+            # Windows: Ctrl+C raises KeyboardInterrupt and the finally block cleans up
+            pass
+
+    start = time.monotonic()
+    monitors = []
+    try:
+        for child in children:
+            await child.start()
+
+        ready = await asyncio.gather(*(child.wait_ready() for child in children))
+        for child, ok in zip(children, ready):
+            if not ok:
+                print(f"❌ {child.name} did not become healthy (see {LOG_DIR}/{child.name}.log)")
+                return 1
+        print(f"✅ All agents ready in {time.monotonic() - start:.1f}s")
+
+        if ui:
+            ui_child = Child("streamlit", [sys.executable, "-m", "streamlit", "run", "travel_ui.py"])
+            await ui_child.start()
+            children.append(ui_child)
+            print("🌐 Open http://localhost:8501 in your browser")
+
+        monitors = [asyncio.ensure_future(child.supervise(stopping)) for child in children]
+        await stopping.wait()
+        return 0
+    finally:
+        print("\n🛑 Stopping all agents...")
+        stopping.set()
+        await asyncio.gather(*(child.stop() for child in children))
+        for monitor in monitors:
+            monitor.cancel()
+
+
 def main():
-    print("Hello from ai-powered-travel-planner!")
+    parser = argparse.ArgumentParser(description="Run the ADK Travel Planner agents and UI")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("AGENT_WORKERS", "1")),
+                        help="uvicorn worker processes per agent")
+    parser.add_argument("--no-ui", action="store_true", help="do not start the Streamlit UI")
+    args = parser.parse_args()
+
+    # The offline fake model backend needs no key
+    fake_model = os.getenv("AGENT_MODEL_BACKEND", "gemini").lower() == "fake"
+    if not os.getenv("GOOGLE_API_KEY") and not fake_model:
+        print("❌ Error: GOOGLE_API_KEY not set in environment or .env file!")
+        sys.exit(1)
+
+    # The agents run in separate processes; have them share one rate limiter
+    os.environ.setdefault("AGENT_RATE_LIMIT_PATH", os.path.join(tempfile.gettempdir(), "travel-planner", "rate_limit.sqlite"))
+
+    sys.exit(asyncio.run(supervise(workers=args.workers, ui=not args.no_ui)))
 
 
 if __name__ == "__main__":
@@ -6,3 +6,61 @@ class TravelRequest(BaseModel):
     end_date: str
     budget: float
     origin: str = "New York"  # Optional field with default
+
+    def cache_key(self, budget_bucket: float = 250.0):
+        """
+        Normalized key identifying equivalent trips.
+
+        Args:
+            budget_bucket: Budgets are rounded to the nearest multiple of this
+                amount so that e.g. $1,990 and $2,010 share a key
+
+        Returns:
+            Hashable tuple of case-folded cities, dates and budget bucket
+        """
+        budget = round(self.budget / budget_bucket) * budget_bucket if budget_bucket > 0 else self.budget
+        return (
+            self.origin.strip().casefold(),
+            self.destination.strip().casefold(),
+            self.start_date.strip(),
+            self.end_date.strip(),
+            budget,
+        )
+
+
+# Structured output schemas: the specialist agents pass these to the model as
+# its response schema, so answers are always JSON in exactly this shape
+class FlightOption(BaseModel):
+    airline: str
+    departure_time: str
+    arrival_time: str
+    duration: str
+    price: float
+
+class FlightOptions(BaseModel):
+    flights: list[FlightOption]
+
+class StayOption(BaseModel):
+    name: str
+    location: str
+    rating: float
+    price_per_night: float
+    amenities: list[str]
+
+class StayOptions(BaseModel):
+    stays: list[StayOption]
+
+class ActivityOption(BaseModel):
+    name: str
+    description: str
+    price: float
+    duration_hours: float
+
+class ActivityOptions(BaseModel):
+    activities: list[ActivityOption]
+
+class TravelPlan(BaseModel):
+    """Combined answer of the fused planner"""
+    flights: list[FlightOption]
+    stays: list[StayOption]
+    activities: list[ActivityOption]
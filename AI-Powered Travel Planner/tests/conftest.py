@@ -0,0 +1,22 @@
+"""
+Offline test settings: the fake model backend, fast fixed latency and no
+files written. Modules read their settings at import time, so these are set
+before any of them is imported.
+"""
+
+import os
+
+os.environ.update({
+    "AGENT_MODEL_BACKEND": "fake",
+    "AGENT_MODEL_TIERS": "",
+    "AGENT_MODEL_RPM": "0",
+    "AGENT_MODEL_TPM": "0",
+    "AGENT_USAGE_PATH": "",
+    "A2A_TRANSPORT": "http",
+    "FAKE_LLM_LATENCY_MS": "20",
+    "FAKE_LLM_LATENCY_DIST": "fixed",
+    "FAKE_LLM_FAILURE_RATE": "0",
+    "PLAN_WARMER_TOP_N": "0",
+})
+for name in ("AGENT_CACHE_PATH", "AGENT_RATE_LIMIT_PATH", "AGENT_UDS_DIR", "FAKE_LLM_MODELS"):
+    os.environ.pop(name, None)
@@ -0,0 +1,102 @@
+"""
+Specialist /run endpoints served in this process: admission slots must be
+returned however a request ends.
+"""
+
+import asyncio
+import contextlib
+import json
+from datetime import date, timedelta
+
+import httpx
+
+from agents.flight_agent.__main__ import app
+
+START = date.today() + timedelta(days=30)
+
+
+def trip(budget=2000):
+    return {"origin": "London", "destination": "Lisbon", "start_date": str(START),
+            "end_date": str(START + timedelta(days=4)), "budget": budget}
+
+
+async def serve(requests):
+    """Run the flight agent app, send requests(client) and return the admission stats after them"""
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://flight") as client:
+            while (await client.get("/health")).status_code != 200:
+                await asyncio.sleep(0.01)
+            await requests(client)
+            return (await client.get("/health")).json()["admission"]
+
+
+def test_malformed_stream_request_frees_its_slot():
+    async def requests(client):
+        for _ in range(2):
+            # No destination, dates or budget
+            await client.post("/run_stream", json={"origin": "London"})
+        response = await client.post("/run", json=trip())
+        assert response.status_code == 200
+
+    admission = asyncio.run(serve(requests))
+    assert admission["in_flight"] == 0
+    assert admission["admitted"] == 3
+
+
+def test_batch_holds_a_slot_per_concurrent_item_until_it_ends():
+    async def requests(client):
+        items = [trip(1000 + i) for i in range(4)] + [{"origin": "London"}]
+        batch = asyncio.ensure_future(client.post("/run_batch", json={"items": items, "concurrency": 2}))
+        while (await client.get("/health")).json()["admission"]["in_flight"] == 0:
+            await asyncio.sleep(0.001)
+        assert (await client.get("/health")).json()["admission"]["in_flight"] == 2
+        lines = [json.loads(line) for line in (await batch).text.splitlines()]
+        assert sorted(line["index"] for line in lines) == list(range(5))
+        assert "destination" in lines[4]["error"]
+
+    admission = asyncio.run(serve(requests))
+    assert admission["in_flight"] == 0
+
+
+def test_stream_abandoned_before_its_first_line_frees_its_slot():
+    async def requests(client):
+        scope = {
+            "type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1",
+            "method": "POST", "scheme": "http", "path": "/run_stream", "raw_path": b"/run_stream",
+            "query_string": b"", "root_path": "", "headers": [(b"content-type", b"application/json")],
+            "server": ("flight", 80), "client": ("test", 1),
+        }
+        body = [{"type": "http.request", "body": json.dumps(trip()).encode(), "more_body": False}]
+
+        async def receive():
+            return body.pop() if body else {"type": "http.disconnect"}
+
+        async def send(message):
+            # The client is gone before the first line is sent
+            raise OSError("connection reset")
+
+        with contextlib.suppress(Exception):
+            await app(scope, receive, send)
+
+    admission = asyncio.run(serve(requests))
+    assert admission["in_flight"] == 0
+
+
+
+def test_metrics_report_request_latency_by_status_and_admission_stats():
+    metrics = []
+
+    async def requests(client):
+        await client.post("/run", json=trip())
+        await client.post("/run", json={"origin": "London"})
+        metrics.append((await client.get("/metrics")).text)
+
+    asyncio.run(serve(requests))
+    text = metrics[0]
+    # Histograms and counters are process-wide, so only their series are checked
+    for status in ("ok", "error"):
+        assert f'a2a_request_duration_seconds_count{{agent="flight_agent",endpoint="run",status="{status}"}}' in text
+    assert 'a2a_admission_wait_seconds_bucket{agent="flight_agent",le="+Inf"}' in text
+    assert 'a2a_requests_in_flight{agent="flight_agent"} 0\n' in text
+    assert 'a2a_agent_stat{agent="flight_agent",stat="admission_in_flight"} 0\n' in text
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from common.admission import AdmissionController, Overloaded
+
+
+def test_full_queue_is_rejected_at_once():
+    admission = AdmissionController(max_concurrency=1, max_queue=0, queue_timeout=5)
+
+    async def main():
+        admitted_at = await admission.acquire()
+        with pytest.raises(Overloaded) as rejected:
+            await asyncio.wait_for(admission.acquire(), 0.5)
+        admission.release(admitted_at)
+        return rejected.value
+
+    error = asyncio.run(main())
+    assert str(error) == "queue full"
+    assert error.retry_after >= 1
+    assert admission.stats()["rejected"] == 1
+    assert admission.stats()["in_flight"] == 0
+
+
+def test_queued_request_times_out():
+    admission = AdmissionController(max_concurrency=1, max_queue=1, queue_timeout=0.05)
+
+    async def main():
+        admitted_at = await admission.acquire()
+        with pytest.raises(Overloaded, match="timed out"):
+            await admission.acquire()
+        assert admission.waiting == 0
+        admission.release(admitted_at)
+        # The slot is free again
+        admission.release(await admission.acquire())
+
+    asyncio.run(main())
+    assert admission.admitted == 2
+    assert admission.rejected == 1
+
+
+def test_queued_request_gets_the_released_slot():
+    admission = AdmissionController(max_concurrency=1, max_queue=1, queue_timeout=1)
+
+    async def main():
+        admitted_at = await admission.acquire()
+        waiter = asyncio.ensure_future(admission.acquire())
+        await asyncio.sleep(0.01)
+        assert admission.stats()["queue_depth"] == 1
+        admission.release(admitted_at)
+        admission.release(await waiter)
+
+    asyncio.run(main())
+    assert admission.admitted == 2
+    assert admission.rejected == 0
+
+
+def test_batches_hold_a_slot_per_concurrent_item():
+    admission = AdmissionController(max_concurrency=4, max_queue=4, queue_timeout=0.05)
+
+    async def main():
+        # Asking for more slots than exist takes them all
+        admitted_at = await admission.acquire(slots=8)
+        assert admission.in_flight == 4
+        with pytest.raises(Overloaded):
+            await admission.acquire()
+        admission.release(admitted_at, slots=8)
+
+        first = await admission.acquire(slots=3)
+        with pytest.raises(Overloaded):
+            await admission.acquire(slots=2)
+        # A timed out batch gives back the slot it had already taken
+        admission.release(await admission.acquire(slots=1))
+        admission.release(first, slots=3)
+
+    asyncio.run(main())
+    assert admission.in_flight == 0
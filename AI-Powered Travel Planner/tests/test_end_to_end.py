@@ -0,0 +1,70 @@
+"""
+Host -> specialist /run_stream over HTTP, served in this process: the host's
+A2A client reaches each specialist's FastAPI app through an ASGI transport.
+"""
+
+import asyncio
+import importlib
+import json
+from datetime import date, timedelta
+
+import httpx
+
+from common import a2a_client
+
+SPECIALISTS = [
+    ("flight_agent", 8001),
+    ("stay_agent", 8002),
+    ("activities_agent", 8003),
+]
+
+
+def trip(budget):
+    start = date.today() + timedelta(days=30)
+    return {"origin": "London", "destination": "Lisbon", "start_date": str(start),
+            "end_date": str(start + timedelta(days=4)), "budget": budget}
+
+
+async def plan(payloads):
+    """Stream a plan from the host for each payload in turn, returning each one's events"""
+    specialists = {
+        f"http://localhost:{port}": httpx.ASGITransport(app=importlib.import_module(f"agents.{name}.__main__").app)
+        for name, port in SPECIALISTS
+    }
+    from agents.host_agent.__main__ import app as host
+
+    a2a_client._client = httpx.AsyncClient(mounts=specialists)
+    async with host.router.lifespan_context(host):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=host), base_url="http://host") as client:
+            plans = []
+            for payload in payloads:
+                response = await client.post("/run_stream", json=payload)
+                assert response.status_code == 200
+                plans.append([json.loads(line) for line in response.text.splitlines() if line])
+            return plans
+
+
+def test_plan_streams_items_then_sections_then_usage():
+    first, repeat = asyncio.run(plan([trip(2000), trip(2010)]))
+
+    done = first[-1]
+    assert done["done"] is True and done["errors"] == [] and done["cached"] is False
+    sections = {event["section"]: event for event in first if "data" in event}
+    assert set(sections) == {"flights", "stay", "activities"}
+    for name, event in sections.items():
+        items = [e["item"] for e in first if e.get("section") == name and "item" in e]
+        # Every option was streamed ahead of its section's final event
+        assert items == event["data"]
+        assert first.index(event) > max(first.index({"section": name, "item": item}) for item in items)
+
+    # Usage comes from the specialists' reports and never leaks into sections
+    usage = done["usage"]
+    assert set(usage["agents"]) == {"flight_agent", "stay_agent", "activities_agent"}
+    assert usage["total"]["calls"] == 3
+    assert usage["total"]["total_tokens"] > 0
+    assert all("_usage" not in json.dumps(event["data"]) for event in sections.values())
+
+    # A budget in the same bucket is answered from the plan cache, free of charge
+    assert repeat[-1]["cached"] is True
+    assert repeat[-1]["usage"]["total"]["calls"] == 0
+    assert {e["section"]: e["data"] for e in repeat if "data" in e} == {n: e["data"] for n, e in sections.items()}
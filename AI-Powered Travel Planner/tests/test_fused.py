@@ -0,0 +1,49 @@
+"""PLAN_MODE=fused: every section planned by one model call on the host"""
+
+import asyncio
+from datetime import date, timedelta
+
+from agents.host_agent import fused, task_manager
+from common.plan_cache import TTLCache
+
+
+def trip(budget=2000):
+    start = date.today() + timedelta(days=30)
+    return {"origin": "London", "destination": "Lisbon", "start_date": str(start),
+            "end_date": str(start + timedelta(days=4)), "budget": budget}
+
+
+def plan(monkeypatch, payload):
+    monkeypatch.setattr(task_manager, "PLAN_MODE", "fused")
+    monkeypatch.setattr(task_manager, "plan_cache", TTLCache(max_entries=8, ttl=60, stale_ttl=0))
+
+    async def main():
+        return [event async for event in task_manager.run_stream(payload)]
+
+    return asyncio.run(main())
+
+
+def test_one_call_streams_every_section(monkeypatch):
+    events = plan(monkeypatch, trip())
+
+    done = events[-1]
+    assert done["errors"] == []
+    assert done["usage"]["total"]["calls"] == 1
+    sections = {event["section"]: event["data"] for event in events if "data" in event}
+    assert set(sections) == {"flights", "stay", "activities"}
+    for name, data in sections.items():
+        assert [event["item"] for event in events if event.get("section") == name and "item" in event] == data
+
+
+def test_failed_planner_call_is_reported_once(monkeypatch):
+    async def unavailable(request):
+        raise RuntimeError("model unavailable")
+        yield
+
+    monkeypatch.setattr(fused, "stream", unavailable)
+    events = plan(monkeypatch, trip(3000))
+
+    assert events[-1]["errors"] == ["Planner agent error: model unavailable"]
+    assert {event["section"]: event["data"] for event in events if "data" in event} == {
+        name: fallback for name, _, _, _, fallback in task_manager.AGENTS
+    }
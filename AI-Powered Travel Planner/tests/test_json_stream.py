@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from common.json_stream import ItemStreamParser
+
+ANSWER = json.dumps({
+    "flights": [
+        {"airline": "Air \"France\"", "note": "{not a brace}", "legs": [{"to": "CDG"}]},
+        {"airline": "Delta", "price": 710},
+    ],
+    "stays": [{"name": "Hotel ]Lumiere["}],
+    "summary": {"flights": [{"ignored": True}]},
+})
+
+
+def parse(chunks, keys=("flights", "stays")):
+    parser = ItemStreamParser(keys)
+    return [pair for chunk in chunks for pair in parser.feed(chunk)]
+
+
+def expected():
+    data = json.loads(ANSWER)
+    return [("flights", item) for item in data["flights"]] + [("stays", item) for item in data["stays"]]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 32, len(ANSWER)])
+def test_items_are_the_same_for_any_chunking(size):
+    chunks = [ANSWER[i:i + size] for i in range(0, len(ANSWER), size)]
+    assert parse(chunks) == expected()
+
+
+def test_item_is_emitted_by_the_chunk_closing_it():
+    parser = ItemStreamParser(("flights",))
+    assert parser.feed('{"flights": [{"airline": "Delta"') == []
+    assert parser.feed('}, {"airline"') == [("flights", {"airline": "Delta"})]
+    assert parser.feed(': "United"}]}') == [("flights", {"airline": "United"})]
+
+
+def test_markdown_fences_are_ignored():
+    assert parse(["```json\n", ANSWER, "\n```"]) == expected()
+
+
+def test_unwatched_keys_and_cut_off_items_yield_nothing():
+    assert parse([ANSWER], keys=("activities",)) == []
+    assert parse(['{"flights": [{"airline": "Delta", "pri']) == []
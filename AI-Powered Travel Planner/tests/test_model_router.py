@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+from google.adk.models.llm_request import LlmRequest
+from google.genai import types
+
+from common.fake_llm import FakeLlm
+from common.model_router import ModelRouter
+
+
+def request():
+    return LlmRequest(
+        contents=[types.Content(role="user", parts=[types.Part(text="Paris in May, $2000")])],
+        config=types.GenerateContentConfig(system_instruction='Respond with {"flights": [{...}]}'),
+    )
+
+
+def router(*tiers, latency_budget=0.05, response_budget=0.0):
+    return ModelRouter(model=tiers[0].model, tiers=list(tiers), latency_budget=latency_budget,
+                       response_budget=response_budget, cooldown=60)
+
+
+def run(llm, stream=False):
+    async def main():
+        return [response async for response in llm.generate_content_async(request(), stream=stream)]
+
+    return asyncio.run(main())
+
+
+def test_out_of_quota_tier_fails_over_and_cools_down():
+    flash = FakeLlm(model="fake-flash", latency_ms=1, failure_rate=1.0)
+    lite = FakeLlm(model="fake-lite", latency_ms=1)
+    llm = router(flash, lite)
+
+    responses = run(llm)
+    assert responses[-1].custom_metadata["model"] == "fake-lite"
+    assert "flights" in responses[-1].content.parts[0].text
+    # Quota errors are not billed, so nothing is reported as abandoned
+    assert "abandoned" not in responses[-1].custom_metadata
+    assert [tier.model for tier in llm.healthy_tiers()] == ["fake-lite"]
+
+
+def test_slow_first_chunk_fails_over_and_is_counted():
+    flash = FakeLlm(model="fake-flash", latency_ms=1000)
+    lite = FakeLlm(model="fake-lite", latency_ms=1)
+
+    responses = run(router(flash, lite), stream=True)
+    assert all(response.custom_metadata["model"] == "fake-lite" for response in responses)
+    assert all("abandoned" not in response.custom_metadata for response in responses if response.partial)
+    abandoned = responses[-1].custom_metadata["abandoned"]
+    assert [attempt["model"] for attempt in abandoned] == ["fake-flash"]
+    assert abandoned[0]["usage"]["prompt_token_count"] > 0
+
+
+def test_whole_answers_are_waited_for_without_a_response_budget():
+    flash = FakeLlm(model="fake-flash", latency_ms=200)
+    lite = FakeLlm(model="fake-lite", latency_ms=1)
+
+    responses = run(router(flash, lite, latency_budget=0.05))
+    assert responses[-1].custom_metadata["model"] == "fake-flash"
+
+
+def test_last_tier_errors_are_raised():
+    flash = FakeLlm(model="fake-flash", latency_ms=1, failure_rate=1.0)
+    lite = FakeLlm(model="fake-lite", latency_ms=1, failure_rate=1.0)
+
+    with pytest.raises(RuntimeError, match="RESOURCE_EXHAUSTED"):
+        run(router(flash, lite))
@@ -0,0 +1,102 @@
+import asyncio
+from datetime import date, timedelta
+
+from agents.host_agent import task_manager
+from common import plan_cache
+from common.plan_cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_go_stale_then_expire(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(plan_cache.time, "monotonic", clock)
+    cache = TTLCache(max_entries=4, ttl=10, stale_ttl=5)
+    cache.set("paris", "plan")
+
+    assert cache.get("paris") == ("plan", "fresh")
+    clock.now += 12
+    assert cache.get("paris") == ("plan", "stale")
+    assert cache.age("paris") == 12
+    clock.now += 4
+    assert cache.get("paris") == (None, None)
+    assert cache.age("paris") is None
+    assert len(cache) == 0
+    assert cache.stats() == {"size": 0, "hits": 1, "stale_hits": 1, "misses": 1}
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_entries=2)
+    cache.set("paris", 1)
+    cache.set("rome", 2)
+    # Reading paris makes rome the least recently used
+    cache.get("paris")
+    cache.set("tokyo", 3)
+
+    assert cache.get("rome") == (None, None)
+    assert cache.get("paris") == (1, "fresh")
+    assert cache.get("tokyo") == (3, "fresh")
+
+
+def test_zero_entries_disables_the_cache():
+    cache = TTLCache(max_entries=0)
+    cache.set("paris", 1)
+    assert cache.get("paris") == (None, None)
+
+
+def test_host_caches_only_plans_whose_sections_all_parsed(monkeypatch):
+    monkeypatch.setattr(task_manager, "plan_cache", TTLCache(max_entries=8, ttl=60, stale_ttl=0))
+    answers = {1000: "Here are some hotels: ...", 3000: [{"name": "Hotel"}]}
+
+    async def fake_plan(payload, key=None, items=False):
+        yield {"section": "flights", "data": [{"airline": "TAP"}]}
+        yield {"section": "stay", "data": answers[payload["budget"]]}
+        yield {"section": "activities", "data": [{"name": "Tram 28"}]}
+
+    monkeypatch.setattr(task_manager, "_plan", fake_plan)
+    start = date.today() + timedelta(days=30)
+
+    def trip(budget):
+        return {"origin": "London", "destination": "Lisbon", "start_date": str(start),
+                "end_date": str(start + timedelta(days=4)), "budget": budget}
+
+    async def cached(budget):
+        events = [event async for event in task_manager.run_stream(trip(budget))]
+        return events[-1]["cached"]
+
+    # A section left as the model's unparsed text is not cached, nor stored by a background refresh
+    assert asyncio.run(cached(1000)) is False
+    assert asyncio.run(cached(1000)) is False
+    key = task_manager._cache_key(trip(1000))
+    asyncio.run(task_manager._refresh(key, trip(1000)))
+    assert task_manager.plan_cache.get(key)[0] is None
+    assert asyncio.run(cached(3000)) is False
+    assert asyncio.run(cached(3000)) is True
+
+
+def test_host_batch_caches_only_plans_whose_sections_all_parsed(monkeypatch):
+    monkeypatch.setattr(task_manager, "plan_cache", TTLCache(max_entries=8, ttl=60, stale_ttl=0))
+    keys = {url: key for _, _, url, key, _ in task_manager.AGENTS}
+
+    async def fake_batch(url, payloads, concurrency, ordered=True):
+        for index, payload in enumerate(payloads):
+            parsed = payload["budget"] == 3000 or keys[url] != "stays"
+            yield {"index": index, "result": {keys[url]: [{"name": "Option"}] if parsed else "Some hotels: ..."}}
+
+    monkeypatch.setattr(task_manager, "call_agent_batch", fake_batch)
+    start = date.today() + timedelta(days=30)
+    trips = [{"origin": "London", "destination": "Lisbon", "start_date": str(start),
+              "end_date": str(start + timedelta(days=4)), "budget": budget} for budget in (1000, 3000)]
+
+    async def batch():
+        return [item async for item in task_manager.run_batch(trips)]
+
+    assert [item["result"]["stay"] for item in asyncio.run(batch())] == ["Some hotels: ...", [{"name": "Option"}]]
+    assert task_manager.plan_cache.get(task_manager._cache_key(trips[0]))[0] is None
+    assert task_manager.plan_cache.get(task_manager._cache_key(trips[1]))[0] is not None
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from common.rate_limit import RateLimiter, current_priority, priority
+
+
+def test_waiters_are_served_most_urgent_first():
+    # 600 requests per minute refill one request every 0.1s
+    limiter = RateLimiter(rpm=600, tpm=0, path=None)
+    order = []
+
+    async def call(name):
+        await limiter.acquire("gemini-2.5-flash", 100, priority=name)
+        order.append(name)
+
+    async def main():
+        for _ in range(600):
+            await limiter.acquire("gemini-2.5-flash", 100)
+        # Queued in the opposite order of their priority
+        tasks = []
+        for name in ("background", "batch", "interactive"):
+            tasks.append(asyncio.ensure_future(call(name)))
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == ["interactive", "batch", "background"]
+    assert limiter.throttled == 3
+    assert limiter.waiting == 0
+
+
+def test_token_estimates_are_settled_to_reported_usage():
+    limiter = RateLimiter(rpm=0, tpm=1000, path=None)
+
+    async def main():
+        await limiter.acquire("gemini-2.5-flash", 1000)
+        # The call used far fewer tokens than estimated; the rest is returned
+        await limiter.settle("gemini-2.5-flash", 1000, 100)
+        await asyncio.wait_for(limiter.acquire("gemini-2.5-flash", 800), 0.5)
+
+    asyncio.run(main())
+    assert limiter.throttled == 0
+
+
+def test_buckets_are_shared_through_a_file(tmp_path):
+    path = str(tmp_path / "rate_limit.sqlite")
+    first = RateLimiter(rpm=2, tpm=0, path=path)
+    second = RateLimiter(rpm=2, tpm=0, path=path)
+
+    async def main():
+        await first.acquire("gemini-2.5-flash", 1)
+        await second.acquire("gemini-2.5-flash", 1)
+        # Both requests of the minute are spent, whichever limiter took them
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(first.acquire("gemini-2.5-flash", 1), 0.2)
+
+    asyncio.run(main())
+    assert first.throttled == 1
+    assert first.waiting == 0
+
+
+def test_priority_scope():
+    assert current_priority() == "interactive"
+    with priority("batch"):
+        assert current_priority() == "batch"
+        with priority("unknown"):
+            assert current_priority() == "interactive"
+    assert current_priority() == "interactive"
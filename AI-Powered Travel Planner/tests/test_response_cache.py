@@ -0,0 +1,43 @@
+import asyncio
+
+from common import response_cache
+from common.response_cache import ResponseCache
+
+
+def test_entries_survive_a_restart_until_they_expire(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache" / "responses.sqlite")
+
+    async def store():
+        await ResponseCache(path, ttl=60).set("model", "prompt", {"flights": [1]})
+
+    asyncio.run(store())
+    reopened = ResponseCache(path, ttl=60)
+    assert asyncio.run(reopened.get("model", "prompt")) == {"flights": [1]}
+    assert asyncio.run(reopened.get("other-model", "prompt")) is None
+    assert reopened.stats() == {"hits": 1, "misses": 1}
+
+    now = response_cache.time.time()
+    monkeypatch.setattr(response_cache.time, "time", lambda: now + 61)
+    assert asyncio.run(reopened.get("model", "prompt")) is None
+
+
+def test_least_recently_read_entries_are_evicted_over_the_size_budget(tmp_path, monkeypatch):
+    monkeypatch.setattr(response_cache, "EVICT_EVERY", 1)
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"), ttl=60, max_bytes=25)
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr(response_cache.time, "time", lambda: next(clock))
+
+    async def fill():
+        await cache.set("model", "a", "x" * 10)
+        await cache.set("model", "b", "x" * 10)
+        await cache.get("model", "a")
+        await cache.set("model", "c", "x" * 10)
+        return [await cache.get("model", prompt) for prompt in "abc"]
+
+    # Each value is 12 bytes of JSON: "b" was read least recently
+    assert asyncio.run(fill()) == ["x" * 10, None, "x" * 10]
+
+
+def test_cache_is_disabled_without_a_path(monkeypatch):
+    monkeypatch.setattr(response_cache, "CACHE_PATH", None)
+    assert response_cache.open_response_cache() is None
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from common.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_result():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "plan"
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("paris", work) for _ in range(5)))
+        return flight, results
+
+    flight, results = asyncio.run(main())
+    assert results == ["plan"] * 5
+    assert len(calls) == 1
+    assert flight.coalesced == 4
+    assert len(flight) == 0
+
+
+def test_error_reaches_every_caller_and_is_not_kept():
+    calls = []
+
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("quota")
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("paris", fail) for _ in range(3)), return_exceptions=True)
+        # The failure is forgotten: the next call runs again
+        with pytest.raises(RuntimeError):
+            await flight.do("paris", fail)
+        return results
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len(calls) == 2
+
+
+def test_streams_are_replayed_to_late_joiners():
+    runs = []
+
+    async def items():
+        runs.append(1)
+        for item in range(3):
+            await asyncio.sleep(0.01)
+            yield item
+
+    async def collect(flight, delay):
+        await asyncio.sleep(delay)
+        return [item async for item in flight.stream("paris", items)]
+
+    async def main():
+        flight = SingleFlight()
+        # The second caller joins after the first item is out
+        return flight, await asyncio.gather(collect(flight, 0), collect(flight, 0.015))
+
+    flight, results = asyncio.run(main())
+    assert results == [[0, 1, 2], [0, 1, 2]]
+    assert len(runs) == 1
+    assert flight.coalesced == 1
+
+
+def test_stream_error_reaches_every_follower():
+    async def items():
+        yield 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("cut off")
+
+    async def collect(flight):
+        seen = []
+        with pytest.raises(RuntimeError):
+            async for item in flight.stream("paris", items):
+                seen.append(item)
+        return seen
+
+    async def main():
+        flight = SingleFlight()
+        return await asyncio.gather(collect(flight), collect(flight))
+
+    assert asyncio.run(main()) == [[1], [1]]
@@ -0,0 +1,79 @@
+import asyncio
+
+from common import specialist as specialist_module
+from common.fake_llm import FakeLlm
+from common.specialist import Specialist
+from common.usage import USAGE_KEY
+from shared.schemas import FlightOptions
+
+
+def specialist(max_output_tokens):
+    def build_agent():
+        from google.adk.agents import Agent
+        from google.genai import types
+
+        return Agent(
+            name="test_flight_agent",
+            model=FakeLlm(model="fake-gemini-2.5-flash", latency_ms=1),
+            generate_content_config=types.GenerateContentConfig(max_output_tokens=max_output_tokens),
+            static_instruction="Suggest flights.",
+            output_schema=FlightOptions,
+        )
+
+    return Specialist("test_flight", build_agent, "flights")
+
+
+def stream(agent, prompt="Paris in May"):
+    async def main():
+        return [event async for event in agent.stream(prompt)]
+
+    return asyncio.run(main())
+
+
+def test_streamed_items_match_the_answer():
+    events = stream(specialist(500))
+    done = events[-1]
+    assert [event["item"] for event in events[:-1]] == done["result"]["flights"]
+    assert len(done["result"]["flights"]) == 3
+    assert done["result"][USAGE_KEY]["calls"] == 1
+
+
+def test_cut_off_answer_resets_the_streamed_items():
+    agent = specialist(50)
+    events = stream(agent)
+    done = events[-1]
+
+    # Some options of the cut-off answer were streamed before it was rerun
+    reset = events.index({"reset": True})
+    assert reset > 0
+    assert [event["item"] for event in events[reset + 1:-1]] == done["result"]["flights"]
+    assert len(done["result"]["flights"]) == 3
+    assert done["result"][USAGE_KEY]["calls"] == 2
+    assert agent.truncations == 1
+    assert agent.output_cap == 100
+
+
+def test_sessions_beyond_the_cap_or_ttl_are_deleted(monkeypatch):
+    monkeypatch.setattr(specialist_module, "MAX_SESSIONS", 3)
+    agent = specialist(500)
+    now = [1000.0]
+    monkeypatch.setattr(specialist_module.time, "monotonic", lambda: now[0])
+
+    async def held(session_ids):
+        service = agent.session_service
+        return [await service.get_session(app_name=agent.app_name, user_id=agent.user_id, session_id=session_id)
+                is not None for session_id in session_ids]
+
+    async def main():
+        # Sessions left open, as by requests cancelled mid-run
+        opened = [await agent._open_session() for _ in range(5)]
+        capped = agent.live_sessions, await held(opened)
+        now[0] += specialist_module.SESSION_TTL
+        latest = await agent._open_session()
+        return capped, agent.live_sessions, await held(opened + [latest])
+
+    (capped_count, capped_held), count, still_held = asyncio.run(main())
+    assert capped_count == 3
+    assert capped_held == [False, False, True, True, True]
+    assert count == 1
+    assert still_held == [False] * 5 + [True]
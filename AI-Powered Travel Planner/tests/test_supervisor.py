@@ -0,0 +1,74 @@
+import asyncio
+import os
+import socket
+import sys
+
+import main
+
+
+def child(code, tmp_path, monkeypatch):
+    """A supervised child running a line of Python, logging under tmp_path"""
+    monkeypatch.setattr(main, "LOG_DIR", str(tmp_path))
+    return main.Child("child", [sys.executable, "-c", code])
+
+
+def test_crashing_child_is_restarted_until_stopping(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "BACKOFF_INITIAL", 0.01)
+    crashing = child("raise SystemExit(3)", tmp_path, monkeypatch)
+
+    async def run():
+        stopping = asyncio.Event()
+        await crashing.start()
+        monitor = asyncio.ensure_future(crashing.supervise(stopping))
+        while crashing.restarts < 3:
+            await asyncio.sleep(0.01)
+        stopping.set()
+        await asyncio.wait_for(monitor, timeout=5)
+        await crashing.process.wait()
+
+    asyncio.run(run())
+    assert crashing.restarts >= 3
+    assert crashing.process.returncode == 3
+
+
+def test_child_exiting_before_it_is_healthy_is_not_ready(tmp_path, monkeypatch):
+    exiting = child("raise SystemExit(1)", tmp_path, monkeypatch)
+    exiting.health_url = "http://127.0.0.1:9/health"
+
+    async def run():
+        await exiting.start()
+        return await exiting.wait_ready()
+
+    assert asyncio.run(run()) is False
+
+
+def test_busy_port_stops_startup(monkeypatch):
+    monkeypatch.setattr(main, "_port_in_use", lambda port: port == 8002)
+    started = []
+    monkeypatch.setattr(main.Child, "start", lambda self: started.append(self.name))
+
+    assert asyncio.run(main.supervise(ui=False)) == 1
+    assert started == []
+
+
+def test_stale_socket_is_removed_before_start_and_on_stop(tmp_path, monkeypatch):
+    path = str(tmp_path / "flight_agent.sock")
+    # A socket file left behind by a crashed run: nothing listens on it
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+        stale.bind(path)
+    assert not main._socket_in_use(path)
+
+    binding = child("import socket, sys; socket.socket(socket.AF_UNIX).bind(sys.argv[1])", tmp_path, monkeypatch)
+    binding.command.append(path)
+    binding.uds = path
+
+    async def run():
+        await binding.start()
+        await binding.process.wait()
+        bound = os.path.exists(path)
+        await binding.stop()
+        return bound
+
+    assert asyncio.run(run()) is True
+    assert binding.process.returncode == 0
+    assert not os.path.exists(path)
@@ -0,0 +1,35 @@
+"""A caller's trace context and timing request carried into a specialist's /run"""
+
+import asyncio
+import json
+from datetime import date, timedelta
+
+import httpx
+
+from agents.flight_agent.__main__ import app
+from common import tracing
+
+
+def test_specialist_joins_the_callers_trace_and_reports_its_timings(tmp_path, monkeypatch):
+    trace_file = tmp_path / "traces" / "spans.jsonl"
+    monkeypatch.setattr(tracing, "TRACE_FILE", str(trace_file))
+    monkeypatch.setattr(tracing, "_writer", None)
+    start = date.today() + timedelta(days=30)
+    trip = {"origin": "London", "destination": "Lisbon", "start_date": str(start),
+            "end_date": str(start + timedelta(days=4)), "budget": 2000}
+
+    async def call():
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://flight") as client:
+                with tracing.span("caller") as caller, tracing.activate(caller, []):
+                    response = await client.post("/run", json=trip, headers=tracing.inject())
+                return caller, response.json()
+
+    caller, result = asyncio.run(call())
+    assert [entry["span"] for entry in result[tracing.TIMING_KEY]][-1] == "flight_agent /run"
+
+    tracing.flush()
+    spans = {span["name"]: span for span in map(json.loads, trace_file.read_text().splitlines())}
+    assert spans["flight_agent /run"]["trace_id"] == caller.trace_id
+    assert spans["flight_agent /run"]["parent_id"] == caller.span_id
+    assert spans["caller"]["span_id"] == caller.span_id
@@ -0,0 +1,46 @@
+"""A specialist served by uvicorn on a Unix domain socket, called through its http+unix:// URL"""
+
+import asyncio
+from datetime import date, timedelta
+
+import uvicorn
+
+from agents.flight_agent.__main__ import app
+from common import a2a_client
+
+
+def test_agent_is_called_over_its_unix_socket(tmp_path, monkeypatch):
+    monkeypatch.setattr(a2a_client, "UDS_DIR", str(tmp_path))
+    url = a2a_client.agent_url("flight_agent", 8001)
+    assert url.startswith("http+unix://")
+    server = uvicorn.Server(uvicorn.Config(app, uds=a2a_client.agent_socket_path("flight_agent"), log_level="warning"))
+    start = date.today() + timedelta(days=30)
+    trip = {"origin": "London", "destination": "Lisbon", "start_date": str(start),
+            "end_date": str(start + timedelta(days=4)), "budget": 2000}
+
+    async def call():
+        serving = asyncio.ensure_future(server.serve())
+        try:
+            while not await a2a_client.agent_ready(url):
+                await asyncio.sleep(0.01)
+            return await a2a_client.call_agent(url, trip)
+        finally:
+            server.should_exit = True
+            await serving
+            await a2a_client.close_client()
+
+    result = asyncio.run(call())
+    assert result["flights"]
+
+
+def test_agent_without_a_socket_is_not_ready(tmp_path, monkeypatch):
+    monkeypatch.setattr(a2a_client, "UDS_DIR", str(tmp_path))
+    url = a2a_client.agent_url("stay_agent", 8002)
+
+    async def check():
+        try:
+            return await a2a_client.agent_ready(url)
+        finally:
+            await a2a_client.close_client()
+
+    assert asyncio.run(check()) is False
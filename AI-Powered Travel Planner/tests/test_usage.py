@@ -0,0 +1,40 @@
+import asyncio
+
+from common import usage
+from common.usage import UsageLedger, price, summarize
+
+
+def record(agent, calls, tokens, cost):
+    return {"agent": agent, "model": "gemini-2.5-flash", "calls": calls, "prompt_tokens": tokens,
+            "cached_tokens": 0, "output_tokens": 0, "total_tokens": tokens, "cost_usd": cost}
+
+
+def test_versioned_and_fake_models_are_priced_as_their_base_model():
+    assert price("gemini-2.5-flash-preview-09-2025") == price("fake-gemini-2.5-flash") == usage.PRICES["gemini-2.5-flash"]
+    assert price("gemini-2.5-flash-lite") == usage.PRICES["gemini-2.5-flash-lite"]
+    assert price("unknown-model") is None
+
+
+def test_processes_sharing_a_ledger_see_each_others_rollups(tmp_path):
+    path = str(tmp_path / "usage" / "daily_usage.sqlite")
+    first, second = UsageLedger(path), UsageLedger(path)
+
+    async def add():
+        await first.add(summarize([record("flight_agent", 1, 100, 0.01), record("stay_agent", 2, 50, 0.02)]))
+        # Cached plans make no model calls and are not counted
+        await first.add(summarize([record("flight_agent", 0, 0, 0.0)]))
+        await second.add(summarize([record("flight_agent", 1, 10, 0.001)]))
+
+    asyncio.run(add())
+    today = second.today()
+    assert (today["requests"], today["calls"], today["total_tokens"], today["cost_usd"]) == (3, 4, 160, 0.031)
+    # Read back after its own last add(), before the other process's
+    assert first.today()["requests"] == 2
+
+
+def test_ledger_is_disabled_without_a_path_or_when_it_cannot_be_opened(tmp_path, monkeypatch):
+    for path in ("", str(tmp_path)):
+        monkeypatch.setattr(usage, "USAGE_PATH", path)
+        monkeypatch.setattr(usage, "_ledger", None)
+        monkeypatch.setattr(usage, "_ledger_opened", False)
+        assert usage.get_usage_ledger() is None
@@ -0,0 +1,73 @@
+import asyncio
+from datetime import date, timedelta
+
+from agents.host_agent.warmer import CacheWarmer
+from common.plan_cache import TTLCache
+
+
+def trip(destination, days=30):
+    start = date.today() + timedelta(days=days)
+    return {"destination": destination, "start_date": str(start), "end_date": str(start + timedelta(days=4))}
+
+
+def warmer(refresh, tmp_path, **options):
+    options = {"top_n": 3, "lead": 10, "token_budget": 1000, "min_requests": 2,
+               "history_path": str(tmp_path / "plan_history.json"), **options}
+    return CacheWarmer(TTLCache(max_entries=8, ttl=60, stale_ttl=0), refresh, lambda payload: payload["destination"],
+                       **options)
+
+
+def test_popular_upcoming_plans_are_warmed_within_the_token_budget(tmp_path):
+    refreshed = []
+
+    async def refresh(key, payload):
+        refreshed.append(key)
+        if key == "Rome":
+            raise RuntimeError("model unavailable")
+        return {"total": {"total_tokens": 1000}}
+
+    warm = warmer(refresh, tmp_path)
+    for destination, count in (("Rome", 4), ("Lisbon", 3), ("Oslo", 2), ("Paris", 1)):
+        for _ in range(count):
+            warm.record(destination, trip(destination))
+    for _ in range(5):
+        warm.record("Athens", trip("Athens", days=-1))
+
+    assert asyncio.run(warm.warm_once()) == 1
+    # Past trips and plans requested once are skipped; Oslo waits for the next hour's budget
+    assert refreshed == ["Rome", "Lisbon"]
+    stats = warm.stats()
+    assert (stats["warmed"], stats["failures"], stats["skipped_budget"]) == (1, 1, 1)
+    assert stats["tokens_last_hour"] == 1000
+
+
+def test_request_history_is_restored_by_the_next_process(tmp_path):
+    async def refresh(key, payload):
+        return None
+
+    first = warmer(refresh, tmp_path)
+    for destination in ("Lisbon", "Lisbon", "Oslo"):
+        first.record(destination, trip(destination))
+    first.save(first._entries())
+
+    second = warmer(refresh, tmp_path)
+    second.load()
+    assert second.popular() == [("Lisbon", trip("Lisbon"))]
+
+    # A damaged history file is ignored
+    (tmp_path / "plan_history.json").write_text("[[1, ")
+    third = warmer(refresh, tmp_path)
+    third.load()
+    assert third.popular() == []
+
+
+def test_disabled_warmer_records_and_warms_nothing(tmp_path):
+    async def refresh(key, payload):
+        raise AssertionError("the warmer is disabled")
+
+    warm = warmer(refresh, tmp_path, top_n=0)
+    for _ in range(3):
+        warm.record("Lisbon", trip("Lisbon"))
+    asyncio.run(warm.run())
+    assert warm.stats()["tracked_plans"] == 0
+    assert not (tmp_path / "plan_history.json").exists()
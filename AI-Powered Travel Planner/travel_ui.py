@@ -4,6 +4,7 @@ from datetime import date
 import json
 import re
 from urllib.parse import quote
+from common import tracing
 
 # --- Constants for new icons ---
 FLIGHT_ICON_URL = "https://i.ibb.co/9g0d8x1/flight-icon.png"
@@ -129,62 +130,44 @@ def render_activity(activity_data, destination=""):
         </div>
     """, unsafe_allow_html=True)
 
-def render_results(data, origin="", destination="", start_date="", end_date=""):
-    st.markdown('<div class="results-grid">', unsafe_allow_html=True)
-
-    # --- Flights ---
-    flights_data = extract_json_from_markdown(data.get("flights", []))
-    # Handle case where JSON has nested "flights" key
-    if isinstance(flights_data, dict) and "flights" in flights_data:
-        flights = flights_data["flights"]
-    elif isinstance(flights_data, list):
-        flights = flights_data
-    else:
-        flights = []
-
-    if flights and isinstance(flights, list):
-        st.markdown('<div class="column"><h3>✈️ Flights</h3>', unsafe_allow_html=True)
-        for flight in flights:
-            render_flight(flight, origin, destination, start_date, end_date)
-        st.markdown('</div>', unsafe_allow_html=True)
-
-    # --- Stays ---
-    stays_data = extract_json_from_markdown(data.get("stay", []))
-    # Handle case where JSON has nested "stays" key
-    if isinstance(stays_data, dict) and "stays" in stays_data:
-        stays = stays_data["stays"]
-    elif isinstance(stays_data, list):
-        stays = stays_data
-    else:
-        stays = []
-
-    if stays and isinstance(stays, list):
-        st.markdown('<div class="column"><h3>🏨 Accommodations</h3>', unsafe_allow_html=True)
-        for stay in stays:
-            render_stay(stay, destination, start_date, end_date)
-        st.markdown('</div>', unsafe_allow_html=True)
-
-    # --- Activities ---
-    activities_data = extract_json_from_markdown(data.get("activities", []))
-    # Handle case where JSON has nested "activities" key
-    if isinstance(activities_data, dict) and "activities" in activities_data:
-        activities = activities_data["activities"]
-    elif isinstance(activities_data, list):
-        activities = activities_data
+# Section name in the host response -> (column heading, nested JSON key)
+SECTIONS = {
+    "flights": ("✈️ Flights", "flights"),
+    "stay": ("🏨 Accommodations", "stays"),
+    "activities": ("🗺️ Activities", "activities"),
+}
+
+def render_section(section, section_data, origin="", destination="", start_date="", end_date=""):
+    heading, key = SECTIONS[section]
+    items_data = extract_json_from_markdown(section_data)
+    # Handle case where JSON has nested key (e.g. {"flights": [...]})
+    if isinstance(items_data, dict) and key in items_data:
+        items = items_data[key]
+    elif isinstance(items_data, list):
+        items = items_data
     else:
-        activities = []
+        items = []
 
-    if activities and isinstance(activities, list):
-        st.markdown('<div class="column"><h3>🗺️ Activities</h3>', unsafe_allow_html=True)
-        for activity in activities:
-            render_activity(activity, destination)
-        st.markdown('</div>', unsafe_allow_html=True)
+    if not items or not isinstance(items, list):
+        return
 
+    st.markdown(f'<div class="column"><h3>{heading}</h3>', unsafe_allow_html=True)
+    for item in items:
+        if section == "flights":
+            render_flight(item, origin, destination, start_date, end_date)
+        elif section == "stay":
+            render_stay(item, destination, start_date, end_date)
+        else:
+            render_activity(item, destination)
     st.markdown('</div>', unsafe_allow_html=True)
 
-    if "summary" in data:
-        st.markdown("### 📋 Trip Summary")
-        st.info(data["summary"])
+def stream_plan(payload, headers=None):
+    """Yield host agent events (each option, then each section) as soon as they arrive"""
+    with requests.post("http://localhost:8000/run_stream", json=payload, headers=headers, stream=True, timeout=120) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line:
+                yield json.loads(line)
 
 # --- Page Configuration and Styling ---
 st.set_page_config(page_title="AI Travel Planner", page_icon="✈️", layout="wide", initial_sidebar_state="collapsed")
@@ -492,17 +475,54 @@ if submit_button:
             "end_date": str(end_date),
             "budget": float(budget)
         }
-        with st.spinner("🔮 Planning your perfect trip..."):
+        status = st.empty()
+        status.info("🔮 Planning your perfect trip...")
+        columns = dict(zip(SECTIONS, st.columns(len(SECTIONS))))
+        placeholders = {section: column.empty() for section, column in columns.items()}
+        streamed = {section: [] for section in SECTIONS}
+        timings = None
+        usage = None
+        # Root span of the trace; the host and specialists join it via headers
+        with tracing.span("travel_ui plan", destination=destination) as ui_span:
+            headers = tracing.inject({tracing.TIMING_HEADER: "1"})
             try:
-                response = requests.post("http://localhost:8000/run", json=payload, timeout=120)
-                if response.ok:
-                    data = response.json()
-                    st.success("✅ Your travel plan is ready!")
-                    render_results(data, origin, destination, str(start_date), str(end_date))
-                else:
-                    st.error(f"❌ Failed to fetch travel plan. Status: {response.status_code}")
-                    st.error(response.text)
+                for event in stream_plan(payload, headers):
+                    if event.get("done"):
+                        timings = event.get(tracing.TIMING_KEY)
+                        usage = event.get("usage")
+                        if event.get("errors"):
+                            status.warning("⚠️ Some results could not be loaded: " + "; ".join(event["errors"]))
+                        else:
+                            status.success("✅ Your travel plan is ready!")
+                        continue
+                    section = event["section"]
+                    if event.get("reset"):
+                        # The answer was cut off and rerun: its options follow again
+                        streamed[section] = []
+                        placeholders[section].empty()
+                        continue
+                    if "item" in event:
+                        # Show each option as soon as the model has written it
+                        streamed[section].append(event["item"])
+                        section_data = streamed[section]
+                    else:
+                        # The agent finished: render its complete answer
+                        section_data = event["data"]
+                    with placeholders[section].container():
+                        render_section(section, section_data, origin, destination, str(start_date), str(end_date))
+            except requests.exceptions.HTTPError as e:
+                status.error(f"❌ Failed to fetch travel plan. Status: {e.response.status_code}")
+                st.error(e.response.text)
             except requests.exceptions.RequestException as e:
-                st.error(f"🔌 Connection error: {e}. Make sure agent servers are running.")
+                status.error(f"🔌 Connection error: {e}. Make sure agent servers are running.")
             except Exception as e:
-                st.error(f"❌ An unexpected error occurred: {e}")
+                status.error(f"❌ An unexpected error occurred: {e}")
+
+        if usage and usage["total"]["calls"]:
+            total = usage["total"]
+            st.caption(f"🪙 {total['total_tokens']:,} tokens over {total['calls']} model call(s), "
+                       f"about ${total['cost_usd']:.4f}")
+
+        if timings:
+            with st.expander("⏱️ Timing breakdown"):
+                st.table(timings + [{"span": ui_span.name, "ms": round(ui_span.duration * 1000, 1)}])